@@ -0,0 +1,60 @@
+import argparse
+import json
+import re
+import timeit
+
+from digipad.utils import extract_data
+
+from .pages import make_account_props, make_page, make_response
+
+
+def extract_data_regex(response):
+    """
+    The previous implementation of `extract_data`, which decodes the whole page and runs a regex on it.
+    """
+    match = re.search(r'<script id="vike_pageContext"[^>]*>(.*?)</script>', response.text)
+    if not match:
+        raise ValueError("Can't extract data from response")
+
+    return json.loads(match[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the page data extractors on account pages.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 800, 3000], help="numbers of pads")
+    parser.add_argument("--repeat", type=int, default=5, help="number of measures for each size")
+    parser.add_argument(
+        "--no-charset",
+        action="store_true",
+        help="simulate responses without a charset (the encoding of the whole page is then guessed)",
+    )
+    args = parser.parse_args()
+    encoding = None if args.no_charset else "utf-8"
+
+    print(f"{'pads':>6} {'page size':>10} {'regex':>10} {'streaming':>10} {'speedup':>8}")
+    for size in args.sizes:
+        page = make_page(make_account_props(size))
+        assert extract_data(make_response(page, encoding)) == extract_data_regex(make_response(page, encoding))
+
+        times = {}
+        for name, func in (("regex", extract_data_regex), ("streaming", extract_data)):
+            number = max(1, 2000 // size)
+            times[name] = (
+                min(
+                    timeit.repeat(
+                        lambda func=func, page=page: func(make_response(page, encoding)),
+                        number=number,
+                        repeat=args.repeat,
+                    )
+                )
+                / number
+            )
+
+        print(
+            f"{size:>6} {len(page) / 1e6:>8.2f}MB {times['regex'] * 1e3:>8.2f}ms {times['streaming'] * 1e3:>8.2f}ms"
+            f" {times['regex'] / times['streaming']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
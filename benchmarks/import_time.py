@@ -0,0 +1,125 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from digipad.cache import AccountSnapshotCache, UserInfoCache, make_snapshot
+from digipad.utils import UserInfo
+
+from .pages import make_account_props
+
+ROOT = Path(__file__).resolve().parent.parent
+# the account used by `digipad list`, whose user information and pads are in the cache of the home directory
+# of the measures (so the command sends no request)
+INSTANCE = "http://127.0.0.1:9"
+COOKIE = "s:benchmark"
+ACCOUNT_PADS = 100
+CACHE_TTL = 24 * 3600
+
+# the code run for each scenario, the import time budget (in milliseconds)
+# and the modules that must not be imported;
+# the budgets are enforced by the linting workflow, that runs this script with --check
+SCENARIOS = {
+    "import digipad": (
+        "import digipad",
+        20,
+        ("click", "tabulate", "webbrowser", "json", "requests", "socketio", "flask"),
+    ),
+    "digipad --help": (
+        """\
+from digipad.commands import cli
+try:
+    cli.main(["--help"], prog_name="digipad")
+except SystemExit:
+    pass
+""",
+        150,
+        ("tabulate", "webbrowser", "requests", "socketio", "flask"),
+    ),
+    # the whole command, with the account in the cache
+    "digipad list": (
+        f"""\
+from digipad.commands import cli
+cli.main(
+    ["--cookie", {COOKIE!r}, "--instance", {INSTANCE!r}, "--cache-ttl", "{CACHE_TTL}", "list", "all", "-v"],
+    prog_name="digipad",
+    standalone_mode=False,
+)
+""",
+        400,
+        ("webbrowser", "socketio", "engineio", "aiohttp", "flask", "werkzeug"),
+    ),
+}
+
+
+def make_home(directory: Path):
+    """
+    Write the cache files of the account of `digipad list` in a home directory.
+    """
+    props = make_account_props(ACCOUNT_PADS)
+    userinfo = UserInfo(username=props["identifiant"], name=props["nom"], cookie=COOKIE)
+    UserInfoCache(CACHE_TTL, directory / ".digipad_userinfo").set(INSTANCE, COOKIE, userinfo)
+    AccountSnapshotCache(CACHE_TTL, directory / ".digipad_snapshots").set(
+        INSTANCE, userinfo.username, make_snapshot(props)
+    )
+
+
+def measure(code, home: Path):
+    """
+    Run `code` in a new interpreter (with `home` as the home directory) and return the total import time
+    of the modules it imports (in milliseconds, without the modules imported at startup) and the names
+    of these modules.
+    """
+    # the modules imported at startup are listed first, up to `site`
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "HOME": str(home), "USERPROFILE": str(home)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = [line for line in result.stderr.splitlines() if line.startswith("import time:")][1:]
+    total = 0
+    modules = set()
+    startup = True
+    for line in lines:
+        _, self_time, _cumulative, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        if startup:
+            if name == "site":
+                startup = False
+            continue
+        total += int(self_time)
+        modules.add(name)
+    return total / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the command line interface.")
+    parser.add_argument("--repeat", type=int, default=5, help="number of measures for each scenario")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with an error if a scenario is over its budget or imports a forbidden module",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'scenario':<16} {'time':>9} {'budget':>9}  forbidden modules")
+    with tempfile.TemporaryDirectory() as home:
+        make_home(Path(home))
+        for name, (code, budget, forbidden) in SCENARIOS.items():
+            measures = [measure(code, Path(home)) for _ in range(args.repeat)]
+            time = min(total for total, _ in measures)
+            imported = sorted(module for module in forbidden if module in measures[0][1])
+            failed = failed or time > budget or bool(imported)
+            print(f"{name:<16} {time:>7.1f}ms {budget:>7}ms  {', '.join(imported) or '-'}")
+
+    if args.check and failed:
+        sys.exit("Import time budget exceeded")
+
+
+if __name__ == "__main__":
+    main()
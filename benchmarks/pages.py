@@ -0,0 +1,106 @@
+import datetime as dt
+import io
+import json
+import random
+
+import requests
+
+HEAD = (
+    '<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8"><title>Digipad</title>'
+    + "".join(f'<link rel="modulepreload" href="/assets/chunks/chunk-{i:04d}.js">' for i in range(60))
+    + "<style>"
+    + "".join(f".c{i}{{margin:{i}px;padding:{i}px;color:#{i:06x}}}" for i in range(2000))
+    + "</style></head>"
+)
+BODY = '<body><div id="app">' + "<div><span>Chargement...</span></div>" * 200 + "</div>"
+TAIL = '<script src="/assets/entries/entry-client-routing.js" type="module" async></script></body></html>'
+
+
+def make_pad(pad_id, rng: random.Random):
+    """
+    Return the data of a pad as it appears in a Digipad page.
+    """
+    return {
+        "id": pad_id,
+        "token": f"{rng.getrandbits(64):016x}",
+        "titre": f"Pad {pad_id} – {' '.join(rng.choice(['classe', 'projet', 'séance', 'groupe']) for _ in range(3))}",
+        "identifiant": "enseignant",
+        "nom": "Enseignant",
+        "fond": "/img/fond1.png",
+        "acces": rng.choice(["public", "prive", "code"]),
+        "code": rng.randrange(1000, 9999),
+        "contributions": "ouvertes",
+        "affichage": "colonnes",
+        "registreActivite": "active",
+        "conversation": "desactivee",
+        "listeUtilisateurs": "activee",
+        "editionNom": "desactivee",
+        "fichiers": "actives",
+        "enregistrements": "desactives",
+        "liens": "actives",
+        "documents": "desactives",
+        "commentaires": "actives",
+        "evaluations": "desactivees",
+        "copieBloc": "desactivee",
+        "ordre": "croissant",
+        "largeur": "normale",
+        "colonnes": json.dumps([f"Colonne {i}" for i in range(rng.randrange(1, 6))]),
+        "affichageColonnes": json.dumps([True] * 5),
+        "bloc": rng.randrange(0, 500),
+        "activite": rng.randrange(0, 2000),
+        "admins": [],
+        "vues": rng.randrange(0, 10000),
+        "date": (dt.datetime(2020, 1, 1) + dt.timedelta(minutes=rng.randrange(2_000_000))).isoformat(),
+    }
+
+
+def make_account_props(n_pads, n_folders=None, seed=0):
+    """
+    Return the `pageProps` of the account page of a user with `n_pads` pads.
+    """
+    rng = random.Random(seed)
+    pads = [make_pad(pad_id, rng) for pad_id in range(1, n_pads + 1)]
+    visited_start = n_pads * 6 // 10
+    admin_start = n_pads * 9 // 10
+    n_folders = max(1, n_pads // 20) if n_folders is None else n_folders
+    return {
+        "identifiant": "enseignant",
+        "nom": "Enseignant",
+        "email": "enseignant@example.com",
+        "langue": "fr",
+        "statut": "utilisateur",
+        "padsCrees": pads[:visited_start],
+        "padsRejoints": pads[visited_start:admin_start],
+        "padsAdmins": pads[admin_start:],
+        "padsFavoris": rng.sample(pads, min(len(pads), 10)),
+        "dossiers": [
+            {
+                "id": f"dossier-{i}",
+                "nom": f"Dossier {i}",
+                "pads": [pad["id"] for pad in rng.sample(pads, min(len(pads), 20))],
+            }
+            for i in range(n_folders)
+        ],
+    }
+
+
+def make_page(page_props: dict):
+    """
+    Return the HTML code (as bytes) of a Digipad page containing the given data.
+    """
+    data = json.dumps({"pageProps": page_props}, ensure_ascii=False)
+    script = f'<script id="vike_pageContext" type="application/json">{data}</script>'
+    return (HEAD + BODY + script + TAIL).encode()
+
+
+def make_response(body: bytes, encoding: "str | None" = "utf-8"):
+    """
+    Return a `requests.Response` that streams the given body, as if it had been requested with `stream=True`.
+
+    If `encoding` is `None`, the response behaves as if the server hadn't sent a charset.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.encoding = encoding
+    response.raw = io.BytesIO(body)
+    return response
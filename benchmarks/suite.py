@@ -0,0 +1,323 @@
+import argparse
+import contextlib
+import datetime as dt
+import gc
+import json
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import requests
+from tabulate import tabulate
+
+from digipad import __version__
+from digipad.cache import make_snapshot
+from digipad.edit import format_pads
+from digipad.fake_server import DEFAULT_PASSWORD, DEFAULT_USERNAME
+from digipad.get_pads import PadsOnAccount
+from digipad.session import Session
+from digipad.utils import extract_data, get_pads_table
+
+from .pages import make_account_props, make_page, make_response
+
+ROOT = Path(__file__).resolve().parent.parent
+# an instance that is never contacted by the benchmarks that don't need a server
+OFFLINE_INSTANCE = "http://127.0.0.1:9"
+# the keys of the results that are shown in their own columns
+ROW_KEYS = ("benchmark", "pads", "time", "time_median", "times", "allocated", "peak_memory")
+
+BENCHMARKS = {}
+
+
+class Metrics(dict):
+    """
+    Additional metrics returned by a measured function.
+    """
+
+
+def benchmark(name):
+    """
+    Register a benchmark: a generator that takes the number of pads on the account and the command line arguments,
+    prepares the data and yields the function to measure (that can return `Metrics`).
+    The code after the `yield` is run when the measures are done.
+    """
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+@contextlib.contextmanager
+def fake_instance(*options):
+    """
+    Run a fake Digipad instance in another process (so it isn't measured with the client)
+    and return its URL.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, "-m", "digipad", "fake-server", "--port", str(port), *map(str, options)]
+    with subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) as process:
+        try:
+            for _ in range(300):
+                if process.poll() is not None:
+                    raise RuntimeError("The fake Digipad instance has stopped")
+                try:
+                    requests.get(url, timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+            yield url
+        finally:
+            process.terminate()
+
+
+def get_fake_session(url, args):
+    """
+    Return a session logged into the account of a fake instance.
+    """
+    session = Session(domain=url, rate=args.rate)
+    session.login(DEFAULT_USERNAME, DEFAULT_PASSWORD)
+    return session
+
+
+def get_pad_dicts(props):
+    """
+    Return the data of all the pads of an account page, without duplicates.
+    """
+    pads = {}
+    for key in ("padsCrees", "padsRejoints", "padsAdmins", "padsFavoris"):
+        for pad in props[key]:
+            pads.setdefault(pad["id"], pad)
+    return list(pads.values())
+
+
+@benchmark("extract_data")
+def bench_extract_data(size, _args):
+    """
+    Extract the data of the account page.
+    """
+    page = make_page(make_account_props(size))
+    yield lambda: extract_data(make_response(page))
+
+
+@benchmark("format_pads")
+def bench_format_pads(size, _args):
+    """
+    Make the `Pad` objects of all the pads of the account.
+    """
+    pads = get_pad_dicts(make_account_props(size))
+    with Session(domain=OFFLINE_INSTANCE) as session:
+        yield lambda: format_pads(pads, {}, session)
+
+
+@benchmark("get_all")
+def bench_get_all(size, _args):
+    """
+    Look up pads with keywords, folders, titles, IDs and URLs (building the indexes).
+    """
+    props = make_account_props(size)
+    pads = get_pad_dicts(props)
+    # keywords, folder names and IDs, a pad title, pad IDs and pad URLs
+    queries = [
+        "created",
+        "favourite",
+        props["dossiers"][0]["nom"],
+        props["dossiers"][-1]["id"],
+        pads[len(pads) // 2]["titre"],
+        *(str(pad["id"]) for pad in pads[::10]),
+        *(f"{OFFLINE_INSTANCE}/p/{pad['id']}/{pad['token']}" for pad in pads[5::10]),
+    ]
+    with Session(domain=OFFLINE_INSTANCE) as session:
+        account = PadsOnAccount.from_snapshot(session, make_snapshot(props))
+
+        def get_all():
+            # the indexes are built by the first lookup of each command
+            account.clear_indexes()
+            return account.get_all(queries)
+
+        yield get_all
+
+
+@benchmark("pads_table")
+def bench_pads_table(size, _args):
+    """
+    Render the table of all the pads of the account (as `digipad list -v`).
+    """
+    props = make_account_props(size)
+    with Session(domain=OFFLINE_INSTANCE) as session:
+        pads = PadsOnAccount.from_snapshot(session, make_snapshot(props)).all
+        yield lambda: tabulate(get_pads_table(pads, True, True, True), headers="keys")
+
+
+@benchmark("socket_commands")
+def bench_socket_commands(size, args):
+    """
+    Create a block on `args.commands` pads (joining each pad) on a fake instance.
+    """
+    with fake_instance("--pads", size, "--export-size", 0) as url, get_fake_session(url, args) as session:
+        pads = session.get_pads(refresh=True).all[: args.commands]
+
+        def run_commands():
+            # one command on each pad, with the join and the departure of the pad
+            latencies = []
+            for pad in pads:
+                start = time.perf_counter()
+                pad.create_block("Benchmark", "Text")
+                latencies.append(time.perf_counter() - start)
+                pad.connection.close()
+            return Metrics(
+                commands=len(latencies),
+                latency_median_ms=statistics.median(latencies) * 1e3,
+                latency_max_ms=max(latencies) * 1e3,
+            )
+
+        yield run_commands
+
+
+@benchmark("export")
+def bench_export(size, args):
+    """
+    Export `args.exports` pads from a fake instance.
+    """
+    with fake_instance("--pads", size, "--export-size", args.export_size) as url, get_fake_session(
+        url, args
+    ) as session:
+        pads = session.get_pads(refresh=True).all[: args.exports]
+
+        def export():
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                paths = [pad.export(directory) for pad in pads]
+                elapsed = time.perf_counter() - start
+                total = sum(Path(path).stat().st_size for path in paths)
+            return Metrics(exports=len(paths), throughput_mb_s=total / 1e6 / elapsed)
+
+        yield export
+
+
+def measure(name, size, args):
+    """
+    Run a benchmark `args.repeat` times and return its results: the wall times, the metrics of the fastest run,
+    and the memory allocated by a last run traced with `tracemalloc` (the memory still allocated at its end
+    and the peak, in bytes).
+    """
+    runs = BENCHMARKS[name](size, args)
+    try:
+        func = next(runs)
+        func()  # warm-up
+
+        times = []
+        metrics = {}
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            ret = func()
+            elapsed = time.perf_counter() - start
+            if not times or elapsed < min(times):
+                metrics = ret if isinstance(ret, Metrics) else {}
+            times.append(elapsed)
+            del ret
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            ret = func()
+            allocated, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del ret
+    finally:
+        runs.close()
+
+    return {
+        "benchmark": name,
+        "pads": size,
+        "time": min(times),
+        "time_median": statistics.median(times),
+        "times": times,
+        "allocated": allocated,
+        "peak_memory": peak,
+        **metrics,
+    }
+
+
+def format_size(n_bytes):
+    """
+    Return a human-readable size.
+    """
+    for unit in ("B", "KB", "MB"):
+        if abs(n_bytes) < 1024:
+            return f"{n_bytes:.0f} {unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} GB"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the time and the memory used by the client on accounts of several sizes."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="numbers of pads")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (by default, all)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of measures for each benchmark and size")
+    parser.add_argument("--commands", type=int, default=20, help="number of pads on which socket commands are run")
+    parser.add_argument("--exports", type=int, default=5, help="number of pads exported")
+    parser.add_argument("--export-size", type=int, default=10 * 1024**2, help="size of the exported files, in bytes")
+    parser.add_argument("--rate", type=float, default=0, help="operations per second of the client (0: unlimited)")
+    parser.add_argument("-o", "--output", type=Path, help="JSON file where the results are saved")
+    parser.add_argument("--compare", type=Path, help="JSON file of previous results to compare the times with")
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        for result in json.loads(args.compare.read_text())["results"]:
+            previous[result["benchmark"], result["pads"]] = result
+
+    results = []
+    rows = []
+    for name in args.only or BENCHMARKS:
+        for size in args.sizes:
+            print(f"{name} ({size} pads)...", end=" ", flush=True)
+            result = measure(name, size, args)
+            print(f"{result['time'] * 1e3:.2f} ms")
+            results.append(result)
+            metrics = {key: value for key, value in result.items() if key not in ROW_KEYS}
+            row = {
+                "benchmark": name,
+                "pads": size,
+                "time": f"{result['time'] * 1e3:.2f} ms",
+                "allocated": format_size(result["allocated"]),
+                "peak memory": format_size(result["peak_memory"]),
+                "metrics": ", ".join(f"{key}={value:.4g}" for key, value in metrics.items()),
+            }
+            if (name, size) in previous:
+                row["vs previous"] = f"{result['time'] / previous[name, size]['time']:.2f}x"
+            rows.append(row)
+
+    print()
+    print(tabulate(rows, headers="keys"))
+
+    if args.output:
+        data = {
+            "version": __version__,
+            "date": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "arguments": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+            "results": results,
+        }
+        args.output.write_text(json.dumps(data, indent=4) + "\n")
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
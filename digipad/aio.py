@@ -0,0 +1,502 @@
+import asyncio
+import typing
+from dataclasses import dataclass, field
+from typing import ClassVar
+from urllib.parse import quote, unquote
+
+import aiohttp
+import socketio
+
+from .cache import USERINFO_CACHE, make_snapshot
+from .edit import ExportFile, Pad, format_pads
+from .get_pads import NOT_PROVIDED, PadsOnAccount
+from .session import DEFAULT_INSTANCE
+from .utils import CHUNK_SIZE, DEFAULT_POOL_SIZE, PageContextExtractor, UserInfo
+
+if typing.TYPE_CHECKING:
+    from .cache import AccountSnapshotCache, UserInfoCache
+
+DEFAULT_CONCURRENCY = 10
+
+
+async def extract_data(response: aiohttp.ClientResponse):
+    """
+    Extract JSON data from a Digipad response, reading it only until the end of the data.
+    """
+    extractor = PageContextExtractor()
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        if extractor.feed(chunk):
+            break
+    return extractor.result()
+
+
+class AsyncPadConnection:
+    """
+    An asyncio connection on a pad that can run commands.
+    """
+
+    def __init__(self, pad: "AsyncPad", session: "AsyncSession | None" = None):
+        self.pad = pad
+        self.session = session or AsyncSession()
+        self.socket = None
+
+    @property
+    def userinfo(self) -> UserInfo:
+        """
+        The user information of this connection.
+        """
+        return self.session.userinfo
+
+    async def connect(self):
+        """
+        Connect to the pad.
+        """
+        if self.socket:
+            return self.socket
+
+        if not await self.session.load_userinfo():
+            self.session.userinfo = await self.session.get_anon_userinfo(self.pad.id, self.pad.hash)
+
+        socket = socketio.AsyncSimpleClient()
+        await socket.connect(
+            self.session.domain,
+            headers={"Cookie": "digipad=" + quote(self.session.cookie)},
+        )
+        self.socket = socket
+
+        await self.run(
+            "connexion",
+            {
+                "pad": self.pad.id,
+                "identifiant": self.session.userinfo.username,
+                "nom": self.session.userinfo.name,
+            },
+        )
+        return socket
+
+    async def close(self):
+        """
+        Disconnect from the pad and remove the socket.
+        """
+        if self.socket:
+            await self.socket.emit("sortie", (self.pad.id, self.userinfo.username))
+            await self.socket.disconnect()
+            self.socket = None
+
+    async def run(self, command, *args, expected=None):
+        """
+        Run a command on the pad.
+        """
+        socket = await self.connect()
+        async with self.session.limit:
+            await socket.emit(command, args)
+            ret = await socket.receive(timeout=10)
+        if ret[0] != (expected or command):
+            raise ValueError(f"Can't run command {command} on pad {self.pad} ({ret})")
+        return ret[1]
+
+
+class AsyncPad(Pad):
+    """
+    A pad whose operations are coroutines.
+    """
+
+    connection_class: ClassVar[type] = AsyncPadConnection
+
+    async def export(self, directory=None):  # pylint: disable=W0236
+        """
+        Export a pad and return the path of the exported ZIP file.
+        """
+        session = self.connection.session
+        if not await session.load_userinfo():
+            raise ValueError("Not logged in")
+
+        async with session.limit:
+            async with session.http.post(
+                f"{session.domain}/api/exporter-pad",
+                json={"padId": self.id, "identifiant": session.userinfo.username, "admin": ""},
+                headers=session.cookie_headers,
+            ) as req:
+                req.raise_for_status()
+                filename = await req.text()
+        if filename == "non_connecte":
+            raise ValueError("Not logged in")
+
+        async with session.limit:
+            async with session.http.get(f"{session.domain}/temp/{filename}") as req2:
+                req2.raise_for_status()
+                with ExportFile(self, directory) as output_file:
+                    async for chunk in req2.content.iter_chunked(CHUNK_SIZE):
+                        output_file.write(chunk)
+                    return output_file.finish()
+
+    async def edit_block(self, title, text, hidden=False, column_n=0, block_id=None):  # pylint: disable=W0221,W0236
+        """
+        Edit a block and return its ID.
+        """
+        await self.connection.connect()
+        ret = await self.connection.run(*self._edit_block_command(title, text, hidden, column_n, block_id))
+        return ret["bloc"]
+
+    async def create_block(self, title, text, hidden=False, column_n=0):  # pylint: disable=W0221,W0236
+        """
+        Create a block and return its ID.
+        """
+        return await self.edit_block(title, text, hidden, column_n, None)
+
+    async def comment_block(self, block_id, title, text):  # pylint: disable=W0221,W0236
+        """
+        Add a comment on a block.
+        """
+        await self.connection.connect()
+        await self.connection.run(*self._comment_block_command(block_id, title, text))
+
+    async def rename_column(self, column_number, column_title):  # pylint: disable=W0221,W0236
+        """
+        Rename a column.
+        """
+        await self.connection.connect()
+        await self.connection.run(*self._rename_column_command(column_number, column_title))
+
+    async def rename(self, title):  # pylint: disable=W0221,W0236
+        """
+        Rename the pad.
+        """
+        await self.connection.connect()
+        await self.connection.run(*self._rename_command(title))
+        self.title = title
+
+
+class AsyncSession:
+    """
+    An asyncio session (logged-in or anonymous account) on the Digipad website.
+
+    At most `concurrency` HTTP requests and socket commands of the session run at the same time,
+    so thousands of pad operations can be gathered on the same event loop.
+
+    The user information must be loaded with `await session.load_userinfo()` before using `userinfo`
+    (the pad operations do it automatically).
+    """
+
+    def __init__(
+        self,
+        cookie=None,
+        domain=DEFAULT_INSTANCE,
+        pool_size=DEFAULT_POOL_SIZE,
+        concurrency=DEFAULT_CONCURRENCY,
+        userinfo_cache: "UserInfoCache | None" = None,
+        snapshot_cache: "AccountSnapshotCache | None" = None,
+    ):
+        self.domain = domain or DEFAULT_INSTANCE
+        self.pool_size = pool_size
+        self.limit = asyncio.Semaphore(concurrency)
+        self.userinfo_cache = USERINFO_CACHE if userinfo_cache is None else userinfo_cache
+        self.snapshot_cache = snapshot_cache
+        self._cookie = cookie
+        self._userinfo: "UserInfo | None" = None
+        self._http: "aiohttp.ClientSession | None" = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_args):
+        await self.close()
+
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        """
+        The HTTP client of the session, a keep-alive connection pool of `pool_size` connections
+        that never stores cookies.
+        """
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                cookie_jar=aiohttp.DummyCookieJar(),
+            )
+        return self._http
+
+    async def close(self):
+        """
+        Close the HTTP client of the session.
+        """
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    @staticmethod
+    def get_cookie_headers(cookie):
+        """
+        Return the HTTP headers that send a Digipad cookie.
+        """
+        return {"Cookie": "digipad=" + quote(cookie)} if cookie else {}
+
+    @property
+    def cookie_headers(self):
+        """
+        The HTTP headers that send the Digipad cookie of the session.
+        """
+        return self.get_cookie_headers(self.cookie)
+
+    @property
+    def userinfo(self) -> UserInfo:
+        """
+        The information about the user of the session.
+        """
+        if self._userinfo is None:
+            if self._cookie:
+                raise RuntimeError("The user information is not loaded, use 'await session.load_userinfo()'")
+            self._userinfo = UserInfo(logged_in=False)
+        return self._userinfo
+
+    @userinfo.setter
+    def userinfo(self, userinfo: UserInfo):
+        self._userinfo = userinfo
+        self._cookie = userinfo.cookie
+        if userinfo.cookie:
+            self.userinfo_cache.set(self.domain, userinfo.cookie, userinfo)
+
+    async def load_userinfo(self) -> UserInfo:
+        """
+        Fetch the information about the user of the session if needed, and return it.
+        """
+        if self._userinfo is None and self._cookie:
+            userinfo = self.userinfo_cache.get(self.domain, self._cookie)
+            if userinfo is None:
+                userinfo = await self.get_userinfo(self._cookie)
+                self.userinfo_cache.set(self.domain, self._cookie, userinfo)
+            self._userinfo = userinfo
+        return self.userinfo
+
+    def logout(self):
+        """
+        Forget the cookie of the session and its cached user information.
+        """
+        if self._cookie:
+            self.userinfo_cache.invalidate(self.domain, self._cookie)
+        self._cookie = None
+        self._userinfo = UserInfo(logged_in=False)
+
+    @property
+    def cookie(self):
+        """
+        The Digipad cookie that is used to make requests.
+        """
+        return self.userinfo.cookie
+
+    @cookie.setter
+    def cookie(self, cookie):
+        if self._cookie:
+            self.userinfo_cache.invalidate(self.domain, self._cookie)
+        if cookie:
+            self.userinfo_cache.invalidate(self.domain, cookie)
+        self._cookie = cookie
+        self._userinfo = None
+
+    async def login(self, username, password):
+        """Log into Digipad and load the corresponding userinfo."""
+        async with self.limit:
+            async with self.http.post(
+                f"{self.domain}/api/connexion",
+                json={
+                    "identifiant": username,
+                    "motdepasse": password,
+                },
+            ) as req:
+                req.raise_for_status()
+
+        if "digipad" not in req.cookies:
+            raise RuntimeError("Can't get Digipad cookie")
+
+        self.userinfo = await self.get_userinfo(unquote(req.cookies["digipad"].value))
+
+    async def get_userinfo(self, digipad_cookie):
+        """
+        Return user information from a Digipad cookie.
+        """
+        try:
+            async with self.limit:
+                async with self.http.get(self.domain, headers=self.get_cookie_headers(digipad_cookie)) as req:
+                    try:
+                        data = await extract_data(req)
+                    except ValueError:
+                        data = None
+        except (OSError, aiohttp.ClientError):
+            return UserInfo(connection_error=True)
+
+        if not req.history or not 300 <= req.history[0].status < 400:
+            return UserInfo(logged_in=False)
+
+        username = str(req.url).rstrip("/").rsplit("/")[-1]
+
+        if data is None:
+            return UserInfo(username, cookie=digipad_cookie)
+        return UserInfo.from_json(data, digipad_cookie)
+
+    async def get_anon_userinfo(self, pad_id, pad_hash):
+        """
+        Return anonymous user information from a pad ID and a hash.
+        """
+        try:
+            async with self.limit:
+                async with self.http.get(f"{self.domain}/p/{pad_id}/{pad_hash}") as req:
+                    data = await extract_data(req)
+        except (OSError, aiohttp.ClientError):
+            return UserInfo(connection_error=True)
+
+        cookie = unquote(req.cookies["digipad"].value)
+
+        return UserInfo.from_json(data, cookie)
+
+    async def get_pads(self, refresh=False) -> "AsyncPadsOnAccount":
+        """
+        Return all the pads on the account, from the account snapshot if it is fresh enough
+        (unless `refresh` is true), otherwise from the account page.
+        """
+        userinfo = await self.load_userinfo()
+        if not self.cookie:
+            return AsyncPadsOnAccount(session=self)
+
+        snapshot = None
+        if self.snapshot_cache and not refresh:
+            snapshot = self.snapshot_cache.get(self.domain, userinfo.username)
+
+        if snapshot is None:
+            async with self.limit:
+                async with self.http.get(
+                    f"{self.domain}/u/" + userinfo.username,
+                    allow_redirects=False,
+                    headers=self.cookie_headers,
+                ) as req:
+                    if 300 <= req.status < 400:
+                        # redirected to home page = not logged in
+                        return AsyncPadsOnAccount(session=self)
+                    req.raise_for_status()
+                    snapshot = make_snapshot((await extract_data(req))["pageProps"])
+
+            if self.snapshot_cache:
+                self.snapshot_cache.set(self.domain, userinfo.username, snapshot)
+
+        return AsyncPadsOnAccount.from_snapshot(self, snapshot)
+
+    async def map(self, func, items, jobs=DEFAULT_CONCURRENCY):
+        """
+        Run the coroutine function `func` on all the `items` with at most `jobs` of them at the same time.
+
+        Return the list of the results in the same order as `items`;
+        the exceptions are returned instead of being raised.
+        """
+        semaphore = asyncio.Semaphore(jobs)
+
+        async def run(item):
+            async with semaphore:
+                return await func(item)
+
+        return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+
+@dataclass
+class AsyncPadsOnAccount(PadsOnAccount):
+    """
+    A list of all pads in an account, whose operations that need the network are coroutines.
+    """
+
+    session: AsyncSession = field(default_factory=AsyncSession)  # type: ignore
+
+    pad_class: ClassVar[type] = AsyncPad
+
+    async def get(self, pad_id: "int | str", default=NOT_PROVIDED):  # pylint: disable=W0236
+        """
+        Return ONE pad with its ID, URL, folder name... (see the documentation for `get_all`).
+        You can specify a default value.
+
+        If more than one pad is returned, the function raises an error.
+        """
+        ret = await self.get_all([pad_id])
+        if len(ret) > 1:
+            raise ValueError("Multiple pads returned")
+        if not ret:
+            if default is not NOT_PROVIDED:
+                return default
+            raise KeyError(f"Couldn't find pad {pad_id}")
+        return ret[0]
+
+    async def get_all(self, pad_ids: "list[int] | list[str] | list[int | str]", jobs=None):  # pylint: disable=W0236
+        """
+        Return the pad IDs and hashes corresponding to the given IDs (see `PadsOnAccount.get_all`).
+        The pads that are not on the account are fetched concurrently, only once each,
+        with at most `jobs` of them at the same time (by default, the pool size of the session).
+        """
+        ret, unknown_pads = self._lookup_all(pad_ids)
+        semaphore = asyncio.Semaphore(jobs or self.session.pool_size)
+
+        async def fetch(pad_id, pad_hash):
+            async with semaphore:
+                return await self.get_pad_info(pad_id, pad_hash)
+
+        fetched_pads = await asyncio.gather(*(fetch(pad_id, pad_hash) for pad_id, pad_hash in unknown_pads.items()))
+        return self._deduplicate(ret, dict(zip(unknown_pads, fetched_pads)))
+
+    async def get_pad_info(self, pad_id, pad_hash):
+        """
+        Return information about a pad from its ID and its hash.
+        """
+        pad = AsyncPad(pad_id, pad_hash)
+        pad.connection = AsyncPadConnection(pad, self.session)
+        try:
+            async with self.session.limit:
+                async with self.session.http.get(f"{self.session.domain}/p/{pad_id}/{pad_hash}") as req:
+                    data = await extract_data(req)
+        except (OSError, aiohttp.ClientError):
+            return pad
+
+        page_props = data.get("pageProps", data)
+        if "pad" not in page_props:
+            return pad
+
+        return format_pads([page_props["pad"]], None, self.session, AsyncPad)[0]
+
+    async def copy_pad(self, pad_id: "int | str", title=None):  # pylint: disable=W0236
+        """
+        Copy the pad with the specified ID. If a `title` is specified, the copy is renamed.
+        """
+        pad = await self.get(pad_id)
+        userinfo = await self.session.load_userinfo()
+        async with self.session.limit:
+            async with self.session.http.post(
+                f"{self.session.domain}/api/dupliquer-pad",
+                json={"padId": pad.id, "identifiant": userinfo.username},
+                headers=self.session.cookie_headers,
+            ) as req:
+                req.raise_for_status()
+                try:
+                    data = await req.json(content_type=None)
+                except ValueError:
+                    raise ValueError(f"Can't copy pad {pad.title} ({await req.text()})") from None
+        if title is not None:
+            copy = format_pads([data], None, self.session, AsyncPad)[0]
+            await copy.rename(title)
+            await copy.connection.close()
+            data["titre"] = title
+        self._add_created_pad(data)
+
+    async def create_pad(self, title, template: "int | str | None" = None):  # pylint: disable=W0236
+        """
+        Create a pad with the specified title.
+        """
+        if template:
+            await self.copy_pad(template, title)
+            return
+
+        userinfo = await self.session.load_userinfo()
+        async with self.session.limit:
+            async with self.session.http.post(
+                f"{self.session.domain}/api/creer-pad",
+                json={"titre": title, "identifiant": userinfo.username},
+                headers=self.session.cookie_headers,
+            ) as req:
+                req.raise_for_status()
+                try:
+                    data = await req.json(content_type=None)
+                except ValueError:
+                    raise ValueError(f"Can't create pad {title} ({await req.text()})") from None
+        self._add_created_pad(data)
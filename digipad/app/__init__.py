@@ -2,25 +2,45 @@ import datetime as dt
 import functools
 import json
 import os
-import random
+import queue
 import re
+import secrets
 import subprocess as sp
 import sys
-import zipfile
+import threading
+import time
 from html import escape
 from pathlib import Path
 from urllib.parse import urlparse
 
-from flask import Flask, Response, redirect, request, session, url_for
+from flask import Flask, Response, g, redirect, request, send_from_directory, session, stream_with_context, url_for
 from tabulate import tabulate
 
+from ..bulk import BulkExecutor, BulkReport, BulkResult
+from ..cache import DEFAULT_CACHE_TTL, get_cache_key
+from ..edit import Pad
+from ..export import ExportArchive, ExportPipeline, stream_zip
+from ..get_pads import PadsOnAccount
 from ..session import DEFAULT_INSTANCE, Session
-from ..utils import get_pads_table, table_verbose_names
+from ..utils import get_http_client, get_pads_table, table_verbose_names
+from .jobs import JobQueue
+from .storage import ExportStore
 
 app = Flask(__name__)
 
 EXPORT_DIRECTORY = Path(__file__).parent / "static/export"
 TEMPLATE = (Path(__file__).parent / "template.html").read_text("utf-8")
+JOB_STREAM_TIMEOUT = 25
+HEADER_CACHE_TTL = DEFAULT_CACHE_TTL
+NOT_LOGGED_IN_HEADER = 'Non connecté – <a href="/login">Se connecter</a>'
+EDITOR_HEAD = (
+    """\
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.css">
+<script src="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/voca@1/index.min.js"></script>
+""",
+    '<script src="/static/editor.js"></script>',
+)
 
 
 class JSONResponse(Response):
@@ -30,6 +50,38 @@ class JSONResponse(Response):
         super().__init__(response, *args, content_type="application/json", **kwargs)
 
 
+@functools.lru_cache
+def get_export_store() -> ExportStore:
+    """Return the store of the exported files, and start deleting the expired ones in the background."""
+    store = ExportStore(EXPORT_DIRECTORY)
+    store.start_sweeper()
+    return store
+
+
+def get_digipad_session() -> Session:
+    """Return the Digipad session of the current request, that is closed at the end of the request."""
+    if "digipad_session" not in g:
+        g.digipad_session = Session(session)
+    return g.digipad_session
+
+
+def reset_worker_state():
+    """
+    Forget the state that can't be shared with a forked process: the HTTP connections
+    and the objects that run background threads (they are created again when they are needed).
+    """
+    get_http_client.cache_clear()
+    get_export_store.cache_clear()
+    get_job_queue.cache_clear()
+
+
+@app.teardown_request
+def close_digipad_session(_exc):
+    digipad_session = g.pop("digipad_session", None)
+    if digipad_session is not None:
+        digipad_session.close()
+
+
 @functools.lru_cache
 def get_version():
     version = os.environ.get("VERCEL_GIT_COMMIT_SHA")
@@ -51,40 +103,76 @@ def get_version():
     return "Inconnu"
 
 
-def get_template(head1="", head2=""):
-    digipad_session = Session(session)
-    userinfo = digipad_session.userinfo
+@functools.lru_cache
+def get_page_template():
+    """Return the template of the pages with the version filled in, so a page is rendered with one `%` operation."""
+    return TEMPLATE.replace("%(version)s", escape(get_version()))
+
+
+def get_instance():
+    """Return the Digipad instance of the browser session."""
+    return session.get("digipad_instance") or DEFAULT_INSTANCE
+
+
+def get_owner_key():
+    """
+    Return a key that identifies the user of the browser session (the Digipad cookie on the instance,
+    or a random ID of the browser session if there is no cookie), without containing the cookie.
+    """
+    cookie = session.get("digipad_cookie")
+    if not cookie:
+        cookie = session.setdefault("anonymous_id", secrets.token_hex(16))
+    return get_cache_key(get_instance(), cookie)
+
+
+def get_userinfo_header() -> dict:
+    """
+    Return the user information shown in the header of the pages (`html` and `logged_in`).
+
+    It is cached in the browser session for `HEADER_CACHE_TTL` seconds (for the same instance and cookie),
+    so the pages are rendered without requests to Digipad.
+    """
+    cookie = session.get("digipad_cookie")
+    if not cookie:
+        return {"html": NOT_LOGGED_IN_HEADER, "logged_in": False}
+
+    key = get_cache_key(get_instance(), cookie)
+    header = session.get("digipad_header")
+    if header and header["key"] == key and time.time() - header["time"] < HEADER_CACHE_TTL:
+        return header
+
+    userinfo = get_digipad_session().userinfo
+    if userinfo.connection_error:
+        # not cached, the connection is checked again on the next page
+        return {"html": "Impossible de vérifier la connexion", "logged_in": False}
+    header = {
+        "key": key,
+        "time": time.time(),
+        "html": (
+            f'{escape(str(userinfo))} – <a href="/logout">Se déconnecter</a>'
+            if userinfo.cookie
+            else NOT_LOGGED_IN_HEADER
+        ),
+        "logged_in": userinfo.logged_in,
+    }
+    session["digipad_header"] = header
+    return header
+
+
+def render_page(title, body, head1="", head2=""):
+    """Return a page of the app."""
     error = session.get("error")
     if error:
         del session["error"]
-    return (
-        TEMPLATE.replace(
-            "%(instance)s",
-            digipad_session.domain,
-        )
-        .replace(
-            "%(version)s",
-            get_version(),
-        )
-        .replace(
-            "%(userinfo)s",
-            (
-                "Impossible de vérifier la connexion"
-                if userinfo and userinfo.connection_error
-                else (
-                    'Non connecté – <a href="/login">Se connecter</a>'
-                    if userinfo is None or not userinfo.cookie
-                    else f'{escape(str(userinfo))} – <a href="/logout">Se déconnecter</a>'
-                )
-            ),
-        )
-        .replace(
-            "%(error)s",
-            "" if not error else f'<div class="error">{escape(error)}</div>',
-        )
-        .replace("%(head1)s", head1)
-        .replace("%(head2)s", head2)
-    )
+    return get_page_template() % {
+        "title": title,
+        "body": body,
+        "head1": head1,
+        "head2": head2,
+        "instance": escape(get_instance()),
+        "userinfo": get_userinfo_header()["html"],
+        "error": "" if not error else f'<div class="error">{escape(error)}</div>',
+    }
 
 
 @app.errorhandler(Exception)
@@ -102,9 +190,9 @@ def error_handler(err):
 
 @app.route("/")
 def home():
-    return get_template() % {
-        "title": "Accueil",
-        "body": f"""\
+    return render_page(
+        "Accueil",
+        f"""\
 <ul>
     <li><a href="{url_for("create")}">Création de capsules</a></li>
     <li><a href="{url_for("create_pad")}">Création de pads</a></li>
@@ -113,13 +201,12 @@ def home():
     <li><a href="{url_for("rename_column")}">Renommage des colonnes</a></li>
 </ul>
 """,
-    }
+    )
 
 
 @app.route("/login", methods=["GET", "POST"])
 def login():
-    digipad_session = Session(session)
-    if digipad_session.userinfo.logged_in:
+    if get_userinfo_header()["logged_in"]:
         return redirect(url_for("home"))
 
     if request.method == "POST":
@@ -130,13 +217,14 @@ def login():
 
         username = request.form.get("username")
         password = request.form.get("password")
+        digipad_session = get_digipad_session()
         digipad_session.login(username, password)
         session["digipad_cookie"] = digipad_session.userinfo.cookie
         return redirect(url_for("home"))
 
-    return get_template() % {
-        "title": "Connexion",
-        "body": """\
+    return render_page(
+        "Connexion",
+        """\
 <h2>Avec nom d'utilisateur et mot de passe</h2>
 <form method="post">
 <p>
@@ -163,64 +251,68 @@ def login():
 </p>
 </form>
 """,
-    }
+    )
 
 
 @app.route("/instance", methods=["GET", "POST"])
 def instance():
-    digipad_session = Session(session)
     if request.method == "POST":
         session["digipad_instance"] = request.form.get("instance") or DEFAULT_INSTANCE
         return redirect(url_for("home"))
 
-    return get_template() % {
-        "title": "Changement d'instance",
-        "body": f"""\
+    return render_page(
+        "Changement d'instance",
+        f"""\
 <form method="post">
 <p>
     <label for="instance">Instance :</label>
-    <input type="text" name="instance" id="instance" value="{escape(digipad_session.domain)}">
+    <input type="text" name="instance" id="instance" value="{escape(get_instance())}">
 </p>
 <p>
     <input type="submit" value="OK">
 </p>
 </form>
 """,
-    }
+    )
 
 
 @app.route("/logout")
 def logout():
-    if "digipad_cookie" in session:
-        del session["digipad_cookie"]
+    get_digipad_session().logout()
+    for key in ("digipad_cookie", "digipad_header"):
+        if key in session:
+            del session[key]
     return redirect(url_for("home"))
 
 
+def create_pad_operation(digipad_session: Session, form, title: str, account: "PadsOnAccount | None" = None):
+    """
+    Create a pad with a title of the form (after the replacements of the form) and return the message.
+    The pad is created on `account` if it is given (so the pads of the account are fetched once for several pads).
+    """
+    if not title.strip():
+        raise ValueError("Empty title")
+
+    for repl in form.get("replacements", "").splitlines():
+        a, _, b = repl.partition("->")
+        if not _:
+            raise ValueError(f"Incorrect replacement string: {repl}")
+        title = re.sub(a, b, title)
+
+    if not form.get("dry_run", ""):
+        (account or digipad_session.pads).create_pad(title, form.get("template", ""))
+    return f"Creating pad {title}... OK\n"
+
+
 @app.route("/create-pad", methods=["GET", "POST"])
 def create_pad():
     if request.method == "POST":
-        title = request.form.get("title", "")
-        template = request.form.get("template", "")
-        replacements = request.form.get("replacements", "")
-        dry_run = request.form.get("dry_run", "")
-        if not title.strip():
-            raise ValueError("Empty title")
-
-        for repl in replacements.splitlines():
-            a, _, b = repl.partition("->")
-            if not _:
-                raise ValueError(f"Incorrect replacement string: {repl}")
-            title = re.sub(a, b, title)
-
-        pads = Session(session).pads
-        if not dry_run:
-            pads.create_pad(title, template)
-        message = f"Creating pad {title}... OK\n"
+        message = create_pad_operation(get_digipad_session(), request.form, request.form.get("title", ""))
         return JSONResponse({"ok": True, "message": message})
 
-    return get_template() % {
-        "title": "Création de pads",
-        "body": """\
+    return render_page(
+        "Création de pads",
+        """\
 <form method="post" action="javascript:;">
 <p>
     <label for="titles">Titres des pads à créer <small>(un par ligne)</small> :</label>
@@ -249,39 +341,38 @@ def create_pad():
 <pre class="output" data-operation="Creating pad"></pre>
 </form>
 """,
-    }
+    )
 
 
-@app.route("/create", methods=["GET", "POST"])
-def create():
-    if request.method == "POST":
-        pad = Session(session).pads.get(request.form.get("pad", ""))
+def create_block_operation(_digipad_session: Session, form, pad: Pad):
+    """Create a block (and its comment) of the form on a pad and return the message."""
+    try:
         block_id = pad.create_block(
-            title=request.form.get("title", ""),
-            text=request.form.get("text", ""),
-            hidden=bool(request.form.get("hidden")),
-            column_n=int(request.form.get("column_n", 1)) - 1,
+            title=form.get("title", ""),
+            text=form.get("text", ""),
+            hidden=bool(form.get("hidden")),
+            column_n=int(form.get("column_n", 1)) - 1,
         )
         message = f"Creating block on #{pad.id}... OK\n"
-        comment = request.form.get("comment", "")
+        comment = form.get("comment", "")
         if comment:
+            pad.comment_block(block_id, form.get("title", ""), comment)
             message += "Commenting... OK\n"
-            pad.comment_block(block_id, request.form.get("title", ""), comment)
+        return message
+    finally:
         pad.connection.close()
+
+
+@app.route("/create", methods=["GET", "POST"])
+def create():
+    if request.method == "POST":
+        pad = get_digipad_session().pads.get(request.form.get("pad", ""))
+        message = create_block_operation(get_digipad_session(), request.form, pad)
         return JSONResponse({"ok": True, "message": message})
 
-    return (
-        get_template(
-            """\
-<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.css">
-<script src="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.js"></script>
-<script src="https://cdn.jsdelivr.net/npm/voca@1/index.min.js"></script>
-""",
-            '<script src="/static/editor.js"></script>',
-        )
-        % {
-            "title": "Création de capsules",
-            "body": """\
+    return render_page(
+        "Création de capsules",
+        """\
 <form method="post" action="javascript:;">
 <p>
     <label for="pads">Pads <small>(un par ligne)</small> :</label>
@@ -316,66 +407,78 @@ def create():
 <pre class="output" data-operation="Creating block"></pre>
 </form>
 """,
-        }
+        *EDITOR_HEAD,
     )
 
 
+def get_export_url(path: Path):
+    """Return the URL of an exported file."""
+    return "/" + path.relative_to(Path(__file__).parent).as_posix()
+
+
+@app.route("/static/export/<path:filename>")
+def exported_file(filename):
+    """Send an exported file if it hasn't expired."""
+    if not get_export_store().touch(filename):
+        return Response("Ce fichier n'existe pas ou a expiré.", status=404, content_type="text/plain; charset=utf-8")
+    return send_from_directory(EXPORT_DIRECTORY, filename)
+
+
 @app.route("/zip", methods=["POST"])
 def zip():
+    """Send a ZIP file with the exported pads while it is written."""
     files = request.form.get("files", "").splitlines()
-    paths: list[Path] = []
+    store = get_export_store()
+    paths: dict[str, Path] = {}
     for file in files:
-        path = Path(urlparse(file).path).resolve()
-        if not path.is_relative_to(EXPORT_DIRECTORY):
+        path = (Path(__file__).parent / urlparse(file).path.lstrip("/")).resolve()
+        if not path.is_relative_to(EXPORT_DIRECTORY.resolve()) or not path.is_file():
             continue
-        paths.append(path)
-
-    export_directory = EXPORT_DIRECTORY / random.randbytes(8).hex()
-    export_directory.mkdir(parents=True, exist_ok=True)
-
-    path = export_directory / f"pads_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-    with zipfile.ZipFile(path, "w") as zip:
-        for path in paths:
-            zip.write(path, path.name)
-    return "/" + path.relative_to(Path(__file__).resolve()).as_posix()
+        paths[store.get_name(path)] = path
+
+    def generate():
+        # the files are not deleted while they are sent, and the expired ones are skipped
+        with store.use(list(paths)) as stored:
+            yield from stream_zip((paths[name].name, paths[name]) for name in stored)
+
+    filename = f"pads_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        generate(),
+        content_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @app.route("/export", methods=["GET", "POST"])
 def export():
     if request.method == "POST":
-        pad = Session(session).pads.get(request.form.get("pad", ""))
-        export_directory = EXPORT_DIRECTORY / random.randbytes(8).hex()
-        export_directory.mkdir(parents=True, exist_ok=True)
-        path = pad.export(export_directory)
-        url = "/" + path.relative_to(Path(__file__).resolve()).as_posix()
-        message = f"Exporting #{pad.id}... OK ({url})\n"
+        pad = get_digipad_session().pads.get(request.form.get("pad", ""))
+        with get_export_store().new_directory() as directory:
+            path = pad.export(directory)
+            get_export_store().add(path)
+        message = f"Exporting #{pad.id}... OK ({get_export_url(path)})\n"
         return JSONResponse({"ok": True, "message": message})
 
-    return (
-        get_template(
-            """\
-<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.css">
-<script src="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.js"></script>
-<script src="https://cdn.jsdelivr.net/npm/voca@1/index.min.js"></script>
-""",
-            '<script src="/static/editor.js"></script>',
-        )
-        % {
-            "title": "Exportation des pads",
-            "body": """\
+    return render_page(
+        "Exportation des pads",
+        """\
 <form method="post" action="javascript:;">
 <p>
     <label for="pads">Pads <small>(un par ligne)</small> :</label>
     <br>
     <textarea name="pads" id="pads"></textarea>
 </p>
+<p>
+    <label for="archive">Une seule archive :</label>
+    <input type="checkbox" name="archive" id="archive">
+</p>
 <p>
     <input type="submit" value="OK">
 </p>
-<pre class="output" data-operation="Renaming column"></pre>
+<pre class="output" data-operation="Exporting pads"></pre>
 </form>
 """,
-        }
+        *EDITOR_HEAD,
     )
 
 
@@ -384,7 +487,7 @@ def list_pads():
     if request.method == "POST":
         query = request.form.get("pads", "")
         format = request.form.get("format", "html")
-        pads = Session(session).pads.get_all(query.splitlines())
+        pads = get_digipad_session().pads.get_all(query.splitlines())
         data = get_pads_table(pads, format != "json", True, True)
 
         if format == "json":
@@ -394,10 +497,9 @@ def list_pads():
             )
 
         if not pads:
-            return get_template() % {
-                "title": "Liste des pads",
-                "body": f"<p>Aucun pad n'a été trouvé avec votre requête :</p><pre>{escape(query)}</pre>",
-            }
+            return render_page(
+                "Liste des pads", f"<p>Aucun pad n'a été trouvé avec votre requête :</p><pre>{escape(query)}</pre>"
+            )
 
         data = [
             {
@@ -407,28 +509,19 @@ def list_pads():
             for line in data
         ]
 
-        return get_template() % {
-            "title": "Liste des pads",
-            "body": f"""\
+        return render_page(
+            "Liste des pads",
+            f"""\
 <p>Les pads correspondant à la requête</p>
 <pre>{escape(query)}</pre>
 <p>sont :</p>
 {tabulate(data, tablefmt="unsafehtml", headers="keys")}
 """,
-        }
-
-    return (
-        get_template(
-            """\
-<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.css">
-<script src="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.js"></script>
-<script src="https://cdn.jsdelivr.net/npm/voca@1/index.min.js"></script>
-""",
-            '<script src="/static/editor.js"></script>',
         )
-        % {
-            "title": "Liste des pads",
-            "body": """\
+
+    return render_page(
+        "Liste des pads",
+        """\
 <form method="post">
 <p>
     <label for="pads">Pads <small>(un par ligne)</small> :</label>
@@ -440,34 +533,32 @@ def list_pads():
 </p>
 </form>
 """,
-        }
+        *EDITOR_HEAD,
     )
 
 
-@app.route("/rename-column", methods=["GET", "POST"])
-def rename_column():
-    if request.method == "POST":
-        pad = Session(session).pads.get(request.form.get("pad", ""))
+def rename_column_operation(_digipad_session: Session, form, pad: Pad):
+    """Rename a column of a pad with the title of the form and return the message."""
+    try:
         pad.rename_column(
-            column_number=int(request.form.get("column_n", 1)) - 1,
-            column_title=request.form.get("title", ""),
+            column_number=int(form.get("column_n", 1)) - 1,
+            column_title=form.get("title", ""),
         )
-        message = f"Renaming column on #{pad.id}... OK\n"
+    finally:
         pad.connection.close()
+    return f"Renaming column on #{pad.id}... OK\n"
+
+
+@app.route("/rename-column", methods=["GET", "POST"])
+def rename_column():
+    if request.method == "POST":
+        pad = get_digipad_session().pads.get(request.form.get("pad", ""))
+        message = rename_column_operation(get_digipad_session(), request.form, pad)
         return JSONResponse({"ok": True, "message": message})
 
-    return (
-        get_template(
-            """\
-<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.css">
-<script src="https://cdn.jsdelivr.net/npm/pell@1/dist/pell.min.js"></script>
-<script src="https://cdn.jsdelivr.net/npm/voca@1/index.min.js"></script>
-""",
-            '<script src="/static/editor.js"></script>',
-        )
-        % {
-            "title": "Renommage des colonnes",
-            "body": """\
+    return render_page(
+        "Renommage des colonnes",
+        """\
 <form method="post" action="javascript:;">
 <p>
     <label for="pads">Pads <small>(un par ligne)</small> :</label>
@@ -488,9 +579,184 @@ def rename_column():
 <pre class="output" data-operation="Renaming column"></pre>
 </form>
 """,
-        }
+        *EDITOR_HEAD,
     )
 
 
+# the operations that can be run by /batch/<operation>, with the beginning of their progress lines
+# (formatted with the title of the pad to create or the ID of the pad)
+BATCH_OPERATIONS = {
+    "create-pad": (create_pad_operation, "Creating pad {}"),
+    "create": (create_block_operation, "Creating block on #{}"),
+    "rename-column": (rename_column_operation, "Renaming column on #{}"),
+    # the pads are exported with an ExportPipeline
+    "export": (None, "Exporting #{}"),
+}
+
+
+def iter_bulk_run(run, get_message, get_summary=None):
+    """
+    Call `run` in a thread with a function that receives the results of a bulk run and yield progress lines:
+    one for each result when it is received (with the message returned by `get_message`) and one at the end
+    with the summary of the `BulkReport` returned by `run` (or the one returned by `get_summary`).
+    """
+    results: queue.Queue = queue.Queue()
+
+    def target():
+        try:
+            results.put(run(results.put))
+        except Exception as err:  # pylint: disable=W0718
+            results.put(err)
+
+    threading.Thread(target=target, daemon=True).start()
+    while True:
+        item = results.get()
+        if isinstance(item, BulkResult):
+            yield {"ok": item.ok, "message": get_message(item)}
+            continue
+        if isinstance(item, BulkReport):
+            summary = get_summary(item) if get_summary else item.summary().partition("\n")[0] + "\n"
+            yield {"ok": not item.failed, "done": True, "message": summary}
+        else:
+            yield {"ok": False, "done": True, "error": f"{type(item).__qualname__}: {item}"}
+        return
+
+
+def iter_batch(digipad_session: Session, operation, form: dict):
+    """
+    Run an operation on all the pads of the `form` (or all the titles for create-pad) and yield progress lines:
+    the number of pads, one line for each pad when it is done and the summary of the run.
+    """
+    func, line_start = BATCH_OPERATIONS[operation]
+    jobs = digipad_session.pool_size
+    # all the pads are exported into one archive, that is stored if a pad has been exported
+    single_archive = operation == "export" and bool(form.get("archive"))
+    archive_path: "Path | None" = None
+
+    try:
+        if operation == "create-pad":
+            items: list = [title for title in form.get("titles", "").splitlines() if title.strip()]
+            describe = line_start.format
+        else:
+            items = digipad_session.pads.get_all(form.get("pads", "").splitlines())
+            describe = lambda pad: line_start.format(pad.id)  # noqa: E731
+    except Exception as err:  # pylint: disable=W0718
+        yield {"ok": False, "done": True, "error": f"{type(err).__qualname__}: {err}"}
+        return
+
+    def get_summary(report: BulkReport):
+        if archive_path:
+            return f"Zip is available at {get_export_url(archive_path)}\n"
+        return report.summary().partition("\n")[0] + "\n"
+
+    def get_message(result: BulkResult):
+        if not result.ok:
+            return f"{describe(result.item)}... Error: {type(result.error).__qualname__}: {result.error}\n"
+        if operation != "export":
+            return result.value
+        if single_archive:
+            return f"{describe(result.item)}... OK\n"
+        return f"{describe(result.item)}... OK ({get_export_url(result.value)})\n"
+
+    def run(on_result):
+        nonlocal archive_path
+        if operation == "create-pad":
+            # the pads of the account are fetched once for all the titles
+            account = None if form.get("dry_run", "") else digipad_session.pads
+            return BulkExecutor(jobs, on_result=on_result).run(
+                lambda title: create_pad_operation(digipad_session, form, title, account), items
+            )
+        if operation != "export":
+            return BulkExecutor(jobs, on_result=on_result).run(lambda item: func(digipad_session, form, item), items)
+        # the directory is deleted if no pad has been exported
+        with get_export_store().new_directory() as directory:
+            if not single_archive:
+
+                def on_exported(result: BulkResult):
+                    if result.ok:
+                        get_export_store().add(result.value)
+                    on_result(result)
+
+                return ExportPipeline(jobs, on_result=on_exported).run(items, directory)
+            path = directory / f"pads_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+            with ExportArchive(path) as archive:
+                report = ExportPipeline(jobs, archive=archive, on_result=on_result).run(items)
+            if report.succeeded:
+                get_export_store().add(path)
+                archive_path = path
+            return report
+
+    yield {"ok": True, "message": f"{len(items)} pad{'s' if len(items) >= 2 else ''} found\n"}
+    yield from iter_bulk_run(run, get_message, get_summary)
+
+
+def check_batch_operation(operation):
+    """Raise an error if an operation can't be run on several pads at once."""
+    if operation not in BATCH_OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+
+
+@app.route("/batch/<operation>", methods=["POST"])
+def batch(operation):
+    """
+    Run an operation on all the pads of the form (or all the titles for create-pad) with one session
+    and send a JSON line for each pad when it is done.
+    """
+    check_batch_operation(operation)
+    lines = iter_batch(get_digipad_session(), operation, request.form.to_dict())
+    return Response(
+        stream_with_context(json.dumps(line) + "\n" for line in lines),
+        content_type="application/x-ndjson",
+    )
+
+
+@functools.lru_cache
+def get_job_queue() -> JobQueue:
+    """Return the queue of the background jobs."""
+    return JobQueue(EXPORT_DIRECTORY)
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Run an operation like /batch/<operation> in a background job and send the ID and the URL of the job."""
+    operation = request.form.get("operation", "")
+    check_batch_operation(operation)
+    cookie = session.get("digipad_cookie")
+    domain = session.get("digipad_instance") or DEFAULT_INSTANCE
+    form = request.form.to_dict()
+
+    def run():
+        with Session(cookie, domain) as digipad_session:
+            yield from iter_batch(digipad_session, operation, form)
+
+    job_id = get_job_queue().submit(operation, run, get_owner_key())
+    return JSONResponse({"ok": True, "id": job_id, "url": url_for("job_status", job_id=job_id)}, status=202)
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Send the status of a job with its progress lines (from the `after`-th one)."""
+    job = get_job_queue().get(job_id, get_owner_key(), request.args.get("after", 0, type=int))
+    if job is None:
+        return JSONResponse({"ok": False, "error": "Unknown job"}, status=404)
+    return JSONResponse({"ok": True, **job})
+
+
+@app.route("/jobs/<job_id>/stream")
+def job_stream(job_id):
+    """
+    Send the progress lines of a job (from the `after`-th one) as JSON lines while they are added.
+
+    The response ends after `JOB_STREAM_TIMEOUT` seconds, so it isn't cut by a proxy: the client
+    asks again for the next lines.
+    """
+    after = request.args.get("after", 0, type=int)
+    owner = get_owner_key()
+    if get_job_queue().get(job_id, owner, after) is None:
+        return JSONResponse({"ok": False, "error": "Unknown job"}, status=404)
+    lines = get_job_queue().follow(job_id, owner, after, timeout=JOB_STREAM_TIMEOUT)
+    return Response((json.dumps(line) + "\n" for line in lines), content_type="application/x-ndjson")
+
+
 if __name__ == "__main__":
     sys.exit("Please use 'digipad web' to run the server.")
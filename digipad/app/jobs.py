@@ -0,0 +1,179 @@
+import json
+import os
+import secrets
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Iterable
+
+DEFAULT_JOB_WORKERS = int(os.environ.get("DIGIPAD_JOB_WORKERS", 2))
+# the finished jobs are deleted after this number of seconds
+DEFAULT_JOB_TTL = int(os.environ.get("DIGIPAD_JOB_TTL", 24 * 3600))
+DATABASE_FILE = ".jobs.sqlite3"
+FINISHED_STATUSES = ("done", "failed", "interrupted")
+# Windows API constants used by `is_running`
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
+
+def is_running(pid):
+    """
+    Return `True` if a process is running.
+    """
+    if os.name == "nt":
+        # on Windows, os.kill(pid, 0) sends a Ctrl+C event instead of checking the process
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)  # type: ignore
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED  # type: ignore
+        try:
+            exit_code = ctypes.c_ulong()
+            return (
+                bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))) and exit_code.value == STILL_ACTIVE
+            )
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class JobQueue:
+    """
+    Long operations of the web app that run in a pool of `workers` threads, outside of the HTTP requests.
+
+    A job produces progress lines (JSON objects, the last one has a `done` key), that are stored
+    with the status of the job in an SQLite database, so they can be read by any process of the app
+    and are kept when the app is restarted. The jobs of a process that has stopped are marked as interrupted.
+
+    Each job belongs to an `owner` (a key that identifies the user who submitted it) and can only be read
+    with this key.
+    """
+
+    def __init__(self, directory: Path, workers=DEFAULT_JOB_WORKERS, ttl=DEFAULT_JOB_TTL):
+        self.path = directory / DATABASE_FILE
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max(workers, 1), thread_name_prefix="digipad-job")
+
+        directory.mkdir(parents=True, exist_ok=True)
+        with self.connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, operation TEXT NOT NULL, status TEXT NOT NULL,"
+                " pid INTEGER NOT NULL, created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS lines (job TEXT NOT NULL, n INTEGER NOT NULL, line TEXT NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS lines_job ON lines (job, n)")
+            columns = [name for _, name, *_ in db.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+            for job_id, pid in db.execute(
+                "SELECT id, pid FROM jobs WHERE status NOT IN (?, ?, ?)", FINISHED_STATUSES
+            ).fetchall():
+                if pid == os.getpid() or not is_running(pid):
+                    db.execute(
+                        "UPDATE jobs SET status = 'interrupted', updated = ? WHERE id = ?", (time.time(), job_id)
+                    )
+
+    @contextmanager
+    def connect(self):
+        """
+        Open a connection to the database, that is committed and closed at the end of the `with` block.
+        """
+        with closing(sqlite3.connect(self.path, timeout=30)) as db:
+            with db:
+                yield db
+
+    def submit(self, operation: str, func: "Callable[[], Iterable[dict]]", owner: str):
+        """
+        Run `func` in the pool as a job of `owner` and return the ID of the job.
+
+        `func` returns an iterable of the progress lines of the job.
+        """
+        job_id = secrets.token_hex(16)
+        now = time.time()
+        with self.connect() as db:
+            db.execute("DELETE FROM lines WHERE job IN (SELECT id FROM jobs WHERE updated < ?)", (now - self.ttl,))
+            db.execute("DELETE FROM jobs WHERE updated < ?", (now - self.ttl,))
+            db.execute(
+                "INSERT INTO jobs (id, operation, status, pid, created, updated, owner)"
+                " VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+                (job_id, operation, os.getpid(), now, now, owner),
+            )
+        self.executor.submit(self._run, job_id, func)
+        return job_id
+
+    def _run(self, job_id, func):
+        self._set_status(job_id, "running")
+        status = "failed"
+        n = 0
+        try:
+            for line in func():
+                with self.connect() as db:
+                    db.execute("INSERT INTO lines VALUES (?, ?, ?)", (job_id, n, json.dumps(line)))
+                    db.execute("UPDATE jobs SET updated = ? WHERE id = ?", (time.time(), job_id))
+                n += 1
+                if line.get("done"):
+                    status = "done" if line.get("ok") else "failed"
+        except Exception as err:  # pylint: disable=W0718
+            line = {"ok": False, "done": True, "error": f"{type(err).__qualname__}: {err}"}
+            with self.connect() as db:
+                db.execute("INSERT INTO lines VALUES (?, ?, ?)", (job_id, n, json.dumps(line)))
+        finally:
+            self._set_status(job_id, status)
+
+    def _set_status(self, job_id, status):
+        with self.connect() as db:
+            db.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def get(self, job_id, owner: str, after=0):
+        """
+        Return the status of a job with its progress lines from the `after`-th one,
+        or `None` if it doesn't exist or doesn't belong to `owner`.
+        """
+        with self.connect() as db:
+            row = db.execute(
+                "SELECT operation, status, created, updated FROM jobs WHERE id = ? AND owner = ?", (job_id, owner)
+            ).fetchone()
+            if row is None:
+                return None
+            lines = [
+                json.loads(line)
+                for (line,) in db.execute("SELECT line FROM lines WHERE job = ? AND n >= ? ORDER BY n", (job_id, after))
+            ]
+        operation, status, created, updated = row
+        return {
+            "id": job_id,
+            "operation": operation,
+            "status": status,
+            "finished": status in FINISHED_STATUSES,
+            "created": created,
+            "updated": updated,
+            "lines": lines,
+            "next": after + len(lines),
+        }
+
+    def follow(self, job_id, owner: str, after=0, interval=0.5, timeout=None):
+        """
+        Yield the progress lines of a job of `owner` from the `after`-th one as they are added,
+        until the job is finished (or for at most `timeout` seconds).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id, owner, after)
+            if job is None:
+                return
+            yield from job["lines"]
+            after = job["next"]
+            if job["finished"] or deadline is not None and time.monotonic() > deadline:
+                return
+            time.sleep(interval)
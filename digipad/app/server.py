@@ -0,0 +1,49 @@
+import os
+
+from flask import Flask
+
+DEFAULT_THREADS = 8
+# the requests that run bulk operations can take a long time
+WORKER_TIMEOUT = 300
+
+
+def get_default_workers():
+    """
+    Return the default number of worker processes (one per CPU).
+    """
+    return os.cpu_count() or 1
+
+
+def serve(app: Flask, host, port, workers=None, threads=None):
+    """
+    Serve the app with Gunicorn in `workers` processes of `threads` threads.
+
+    The app is loaded before the workers are started, and each worker resets the state
+    that can't be shared between processes (HTTP connections, background threads).
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as err:
+        raise RuntimeError("Gunicorn is needed to run several workers: pip install digipad-api[web]") from err
+
+    from . import reset_worker_state
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers or get_default_workers(),
+        "threads": threads or DEFAULT_THREADS,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": WORKER_TIMEOUT,
+        "post_fork": lambda _server, _worker: reset_worker_state(),
+    }
+
+    class DigipadApplication(BaseApplication):  # pylint: disable=W0223
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    DigipadApplication().run()
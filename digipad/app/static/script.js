@@ -15,84 +15,80 @@ window.addEventListener("DOMContentLoaded", () => {
             var updateText = () => {output.textContent = text + currentLine};
             var nextLine = () => {text += currentLine; currentLine = ""};
 
-            if(form.titles) {
-                var pads = form.titles.value.split("\n");
-            } else {
-                var formdata = new FormData();
-                formdata.append("pads", form.pads.value);
-                formdata.append("format", "json");
+            // the server runs the operation on all the pads in a background job
+            var formdata = new FormData(form);
+            formdata.append("operation", location.pathname.slice(1));
+            formdata.append("format", "json");
 
-                currentLine = "Fetching pads list... ";
-                updateText();
-                var req = await fetch(
-                    "/list",
-                    {
-                        method: "POST",
-                        body: formdata
-                    },
-                );
-                var pads = await req.json();
-            }
-            currentLine += `${pads.length} pad${pads.length >= 2 ? "s" : ""} found\n`;
+            currentLine = form.titles ? "" : "Fetching pads list... ";
             updateText();
-
-            for(var i = 0, l = pads.length; i < l; i++) {
-                nextLine();
-
-                var pad = pads[i];
-                var formdata = new FormData(form);
-                if(form.titles) {
-                    formdata.delete("titles");
-                    formdata.append("title", pad);
-                } else {
-                    formdata.delete("pads");
-                    formdata.append("pad", pad.id + "/" + pad.hash);
-                }
-                formdata.append("format", "json");
-
-                if(form.titles) {
-                    currentLine = `${operation} ${pad}... `;
-                } else {
-                    currentLine = `${operation} on #${pad.id}... `;
-                }
+            var req = await fetch(
+                "/jobs",
+                {
+                    method: "POST",
+                    body: formdata
+                },
+            );
+            var job = await req.json();
+            if(!job.ok) {
+                currentLine += `Error: ${job.error}\n`;
                 updateText();
-                var req = await fetch(
-                    location.href,
-                    {
-                        method: "POST",
-                        body: formdata
-                    },
-                );
-                var data = await req.json();
+                return;
+            }
 
-                currentLine = data.ok ? data.message : `${currentLine}Error: ${data.error}\n`;
-                updateText();
+            // the job sends a JSON line for each pad when it is done, the last one has a "done" key
+            var received = 0;
+            var finished = false;
+            while(!finished) {
+                var req = await fetch(`${job.url}/stream?after=${received}`);
+                if(!req.ok) break;
+                var reader = req.body.pipeThrough(new TextDecoderStream()).getReader();
+                var buffer = "";
+                while(true) {
+                    var {value, done} = await reader.read();
+                    if(value) buffer += value;
+                    var lines = buffer.split("\n");
+                    buffer = done ? "" : lines.pop();
+                    for(var line of lines) {
+                        if(!line.trim()) continue;
+                        var data = JSON.parse(line);
+                        received++;
+                        finished = finished || data.done;
+                        currentLine += "message" in data ? data.message : `Error: ${data.error}\n`;
+                        nextLine();
+                        updateText();
 
-                if(exporting) {
-                    var match = /\((\/static\/.*?)\)/.exec(data.message);
-                    if(match) filenames.push(match[1]);
+                        if(exporting && data.ok) {
+                            var match = /\((\/static\/.*?)\)/.exec(data.message);
+                            if(match) filenames.push(match[1]);
+                        }
+                    }
+                    if(done) break;
                 }
             }
 
+            if(exporting && form.archive && form.archive.checked) return;
+
             if(exporting) {
                 nextLine();
 
                 currentLine = `Zipping ${filenames.length} pad${filenames.length >= 2 ? "s" : ""}... `;
                 updateText();
 
-                var formdata = new FormData();
-                formdata.append("files", filenames.join("\n"));
-                formdata.append("format", "json");
-                var req = await fetch(
-                    "/zip",
-                    {
-                        method: "POST",
-                        body: formdata
-                    },
-                );
-                var data = await req.text();
+                // the browser downloads the ZIP file while the server writes it
+                var zipForm = document.createElement("form");
+                zipForm.method = "post";
+                zipForm.action = "/zip";
+                zipForm.hidden = true;
+                var files = document.createElement("textarea");
+                files.name = "files";
+                files.value = filenames.join("\n");
+                zipForm.appendChild(files);
+                document.body.appendChild(zipForm);
+                zipForm.submit();
+                zipForm.remove();
 
-                currentLine += `Zip is available at ${data}\n`;
+                currentLine += "download started\n";
                 updateText();
             }
         });
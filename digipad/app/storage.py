@@ -0,0 +1,200 @@
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+DEFAULT_EXPORT_TTL = int(os.environ.get("DIGIPAD_EXPORT_TTL", 3600))
+DEFAULT_EXPORT_MAX_SIZE = int(os.environ.get("DIGIPAD_EXPORT_MAX_SIZE", 1024**3))
+DEFAULT_SWEEP_INTERVAL = 60
+INDEX_FILE = ".index.sqlite3"
+
+
+class ExportStore:
+    """
+    The directory where the web app stores the exported files, each one in its own random directory.
+
+    The files are deleted `ttl` seconds after they have been created, and the least recently used ones
+    are deleted when the total size of the files is over `max_size`. The files are listed in an SQLite index
+    (shared by the processes of the app), so the cleanup doesn't have to walk the directory.
+
+    The files that are being sent (see `use`) are not deleted, nor is the file that has just been added.
+    """
+
+    def __init__(self, directory: Path, ttl=DEFAULT_EXPORT_TTL, max_size=DEFAULT_EXPORT_MAX_SIZE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.index = directory / INDEX_FILE
+        self.sweeper: "threading.Thread | None" = None
+        self.lock = threading.Lock()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        new_index = not self.index.exists()
+        with self.connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS files"
+                " (name TEXT PRIMARY KEY, size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS files_accessed ON files (accessed)")
+            columns = [name for _, name, *_ in db.execute("PRAGMA table_info(files)")]
+            if "in_use" not in columns:
+                # number of responses that are sending the file
+                db.execute("ALTER TABLE files ADD COLUMN in_use INTEGER NOT NULL DEFAULT 0")
+        if new_index:
+            self.rebuild_index()
+
+    @contextmanager
+    def connect(self):
+        """
+        Open a connection to the index, that is committed and closed at the end of the `with` block.
+        """
+        with closing(sqlite3.connect(self.index, timeout=30)) as db:
+            with db:
+                yield db
+
+    def get_name(self, path: Path):
+        """
+        Return the name of a file of the store in the index.
+        """
+        return path.resolve().relative_to(self.directory.resolve()).as_posix()
+
+    @contextmanager
+    def new_directory(self):
+        """
+        Create a new random directory for exported files and return its path.
+
+        The directory is deleted at the end of the `with` block if none of its files has been added
+        (e.g. if the export has failed), so the sweeper doesn't have to find it.
+        """
+        path = self.directory / random.randbytes(8).hex()
+        path.mkdir(parents=True, exist_ok=True)
+        try:
+            yield path
+        finally:
+            with self.connect() as db:
+                added = db.execute("SELECT 1 FROM files WHERE name LIKE ? LIMIT 1", (f"{path.name}/%",)).fetchone()
+            if not added:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def add(self, path: Path):
+        """
+        Add a file to the index (and delete old files if the store is over quota).
+        """
+        now = time.time()
+        name = self.get_name(path)
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO files (name, size, created, accessed) VALUES (?, ?, ?, ?)",
+                (name, path.stat().st_size, now, now),
+            )
+        # the URL of the file is about to be given, so it is kept even if it is over quota on its own
+        self.sweep(expired=False, keep=(name,))
+
+    def touch(self, name):
+        """
+        Record that a file has been used and return `True` if it is still stored.
+        """
+        with self.connect() as db:
+            cursor = db.execute(
+                "UPDATE files SET accessed = ? WHERE name = ? AND created >= ?",
+                (time.time(), name, time.time() - self.ttl),
+            )
+        return cursor.rowcount > 0
+
+    @contextmanager
+    def use(self, names: "list[str]"):
+        """
+        Mark files as used until the end of the `with` block, so they aren't deleted while they are sent,
+        and return the names of the ones that are still stored.
+        """
+        now = time.time()
+        with self.connect() as db:
+            stored = []
+            for name in names:
+                cursor = db.execute(
+                    "UPDATE files SET accessed = ?, in_use = in_use + 1 WHERE name = ? AND created >= ?",
+                    (now, name, now - self.ttl),
+                )
+                if cursor.rowcount:
+                    stored.append(name)
+        try:
+            yield stored
+        finally:
+            with self.connect() as db:
+                db.executemany(
+                    "UPDATE files SET in_use = MAX(in_use - 1, 0) WHERE name = ?", [(name,) for name in stored]
+                )
+
+    def rebuild_index(self):
+        """
+        Add the files that are in the directory but not in the index (e.g. files created before the index).
+        """
+        with self.connect() as db:
+            for path in self.directory.glob("*/*"):
+                if path.is_file():
+                    stat = path.stat()
+                    db.execute(
+                        "INSERT OR IGNORE INTO files (name, size, created, accessed) VALUES (?, ?, ?, ?)",
+                        (self.get_name(path), stat.st_size, stat.st_mtime, stat.st_atime),
+                    )
+
+    def sweep(self, expired=True, keep=()):
+        """
+        Delete the expired files (if `expired` is true) and the least recently used files until the store
+        is under quota, except the files in `keep` and the files in use. Return the number of deleted files.
+        """
+        limit = time.time() - self.ttl
+        with self.lock, self.connect() as db:
+            to_delete = []
+            if expired:
+                # a file marked as used for longer than the TTL has been left by a process that has stopped
+                to_delete += [
+                    name
+                    for (name,) in db.execute(
+                        "SELECT name FROM files WHERE created < ? AND (in_use = 0 OR accessed < ?)", (limit, limit)
+                    )
+                ]
+            (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM files WHERE created >= ?", (limit,)).fetchone()
+            if total > self.max_size:
+                for name, size in db.execute(
+                    "SELECT name, size FROM files WHERE created >= ? AND in_use = 0 ORDER BY accessed", (limit,)
+                ):
+                    if total <= self.max_size:
+                        break
+                    if name not in to_delete and name not in keep:
+                        to_delete.append(name)
+                        total -= size
+
+            for name in to_delete:
+                path = self.directory / name
+                path.unlink(True)
+                try:
+                    path.parent.rmdir()
+                except OSError:
+                    # the directory contains other files
+                    pass
+            db.executemany("DELETE FROM files WHERE name = ?", [(name,) for name in to_delete])
+        return len(to_delete)
+
+    def start_sweeper(self, interval=DEFAULT_SWEEP_INTERVAL):
+        """
+        Start a background thread that deletes the expired files every `interval` seconds (if it is not running).
+        """
+        with self.lock:
+            if self.sweeper is not None and self.sweeper.is_alive():
+                return
+
+            def sweep_forever():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.sweep()
+                    except (OSError, sqlite3.Error):
+                        pass
+
+            self.sweeper = threading.Thread(target=sweep_forever, name="digipad-export-sweeper", daemon=True)
+            self.sweeper.start()
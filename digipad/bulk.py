@@ -0,0 +1,160 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from .progress import Progress
+
+
+@dataclass
+class BulkResult:
+    """
+    The result of an operation on one item of a bulk run.
+    """
+
+    item: Any
+    value: Any = None
+    error: "BaseException | None" = None
+    duration: float = 0.0
+    skipped: bool = False
+
+    @property
+    def ok(self):
+        """
+        `True` if the operation succeeded.
+        """
+        return self.error is None
+
+
+@dataclass
+class BulkReport:
+    """
+    The results of a bulk run, in the same order as the items.
+    """
+
+    results: list[BulkResult] = field(default_factory=list)
+    duration: float = 0.0
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def succeeded(self):
+        """
+        The results of the operations that succeeded.
+        """
+        return [result for result in self.results if result.ok]
+
+    @property
+    def skipped(self):
+        """
+        The results of the items that have been skipped (e.g. the pads that haven't changed).
+        """
+        return [result for result in self.results if result.skipped]
+
+    @property
+    def failed(self):
+        """
+        The results of the operations that failed.
+        """
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def values(self):
+        """
+        The values returned by the operations that succeeded.
+        """
+        return [result.value for result in self.succeeded]
+
+    def summary(self):
+        """
+        Return a summary of the run, with the errors of the operations that failed.
+        """
+        skipped = f" ({len(self.skipped)} skipped)" if self.skipped else ""
+        lines = [
+            f"{len(self.succeeded)} succeeded{skipped}, {len(self.failed)} failed"
+            f" ({len(self)} in total, {self.duration:.1f} s)"
+        ]
+        for result in self.failed:
+            lines.append(f"  {result.item}: {type(result.error).__name__}: {result.error}")
+        return "\n".join(lines)
+
+
+class BulkExecutor:
+    """
+    Run an operation on many items (e.g. pads) with at most `jobs` of them at the same time.
+
+    An error on an item doesn't stop the other ones: it is recorded in the result of the item.
+    If `describe` is given, a line is printed when each operation is done
+    (e.g. `Exporting pad #1... OK`), with the message returned by `describe` for the item.
+    With one job, the beginning of the line is printed when the operation starts, as a `Progress`.
+    If `on_result` is given, it is called with each result when the operation is done (from the worker threads).
+    """
+
+    def __init__(
+        self,
+        jobs=1,
+        describe: "Callable[[Any], str] | None" = None,
+        on_result: "Callable[[BulkResult], Any] | None" = None,
+    ):
+        self.jobs = max(jobs, 1)
+        self.describe = describe
+        self.on_result = on_result
+        self.print_lock = threading.Lock()
+
+    def _run_one(self, func, item):
+        start = time.perf_counter()
+        progress = Progress(self.describe(item)) if self.describe and self.jobs == 1 else None
+        try:
+            if progress:
+                progress.start(progress.message)
+            result = BulkResult(item, value=func(item))
+        except Exception as err:  # pylint: disable=W0718
+            result = BulkResult(item, error=err)
+        result.duration = time.perf_counter() - start
+        self.report(result, progress)
+        return result
+
+    def report(self, result: BulkResult, progress: "Progress | None" = None):
+        """
+        Print the line of a result (if there is a `describe` function) and pass it to `on_result`.
+        If the `progress` of the operation is given, only the end of the line is printed.
+        """
+        if self.on_result:
+            self.on_result(result)
+        if self.describe:
+            if result.skipped:
+                status = "SKIPPED"
+            elif result.ok:
+                status = "OK"
+            else:
+                status = f"ERROR: {type(result.error).__name__}: {result.error}"
+            with self.print_lock:
+                if progress:
+                    print(status, flush=True)
+                else:
+                    print(f"{self.describe(result.item)}... {status}", flush=True)
+
+    def run(self, func: "Callable[[Any], Any]", items: Iterable) -> BulkReport:
+        """
+        Run `func` on all the `items` and return the report of the run.
+        """
+        items = list(items)
+        start = time.perf_counter()
+        if not items:
+            return BulkReport()
+
+        with ThreadPoolExecutor(min(self.jobs, len(items))) as executor:
+            results = list(executor.map(lambda item: self._run_one(func, item), items))
+        return BulkReport(results, time.perf_counter() - start)
+
+
+def run_bulk(func, items, jobs=1, describe=None) -> BulkReport:
+    """
+    Run `func` on all the `items` with at most `jobs` of them at the same time and return the report of the run.
+    """
+    return BulkExecutor(jobs, describe).run(func, items)
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from .utils import COOKIE_FILE, UserInfo
+
+DEFAULT_CACHE_TTL = 300
+USERINFO_CACHE_FILE = COOKIE_FILE.with_name(".digipad_userinfo")
+SNAPSHOT_DIRECTORY = COOKIE_FILE.with_name(".digipad_snapshots")
+
+SNAPSHOT_PAD_LISTS = ("padsCrees", "padsRejoints", "padsAdmins", "padsFavoris")
+SNAPSHOT_PAD_KEYS = (
+    "id",
+    "token",
+    "titre",
+    "code",
+    "acces",
+    "colonnes",
+    "date",
+    "identifiant",
+    "nom",
+    "email",
+    "couleur",
+    "langue",
+    "statut",
+    # change markers
+    "modifie",
+    "activite",
+    "bloc",
+)
+SNAPSHOT_FOLDER_KEYS = ("id", "nom", "pads")
+
+
+def get_cache_key(domain, cookie):
+    """
+    Return a key that identifies a cookie on a Digipad instance without containing the cookie.
+    """
+    return hashlib.sha256(f"{domain}\0{cookie}".encode()).hexdigest()
+
+
+class UserInfoCache:
+    """
+    A cache of user information keyed by (domain, cookie) whose entries expire after `ttl` seconds.
+
+    If `path` is given, the cache is also stored in this file so it can be reused between runs.
+    """
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, path: "Path | None" = None):
+        self.ttl = ttl
+        self.path = path
+        self.entries: "dict[str, dict] | None" = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        """
+        Return the cache entries, reading them from the cache file the first time.
+        """
+        if self.entries is None:
+            self.entries = {}
+            if self.path:
+                try:
+                    self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    pass
+        return self.entries
+
+    def _save(self):
+        """
+        Write the cache entries that are still valid to the cache file.
+        """
+        if not self.path:
+            return
+        now = time.time()
+        entries = {key: entry for key, entry in self._load().items() if now - entry["time"] < self.ttl}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            tmp_path.write_text(json.dumps(entries), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def get(self, domain, cookie) -> "UserInfo | None":
+        """
+        Return the cached user information for a cookie, or `None` if it is missing or expired.
+        """
+        if self.ttl <= 0:
+            return None
+        with self.lock:
+            entry = self._load().get(get_cache_key(domain, cookie))
+        if not entry or time.time() - entry["time"] >= self.ttl:
+            return None
+        return UserInfo(**{**entry["userinfo"], "cookie": cookie if entry["has_cookie"] else ""})
+
+    def set(self, domain, cookie, userinfo: UserInfo):
+        """
+        Store the user information for a cookie.
+        """
+        if self.ttl <= 0 or userinfo.connection_error:
+            return
+        data = asdict(userinfo)
+        del data["cookie"]
+        with self.lock:
+            self._load()[get_cache_key(domain, cookie)] = {
+                "time": time.time(),
+                "userinfo": data,
+                "has_cookie": bool(userinfo.cookie),
+            }
+            self._save()
+
+    def invalidate(self, domain, cookie):
+        """
+        Remove the cached user information for a cookie.
+        """
+        with self.lock:
+            if self._load().pop(get_cache_key(domain, cookie), None) is not None:
+                self._save()
+
+
+USERINFO_CACHE = UserInfoCache()
+
+
+def make_snapshot(page_props: dict):
+    """
+    Return a snapshot of an account from the data of its Digipad page,
+    keeping only what is needed to build the pad lists and the folders.
+    """
+    snapshot = {}
+    pad_hashes = {}
+    for key in SNAPSHOT_PAD_LISTS:
+        snapshot[key] = []
+        for pad in page_props.get(key, []):
+            snapshot[key].append({k: pad[k] for k in SNAPSHOT_PAD_KEYS if k in pad})
+            pad_hashes[pad["id"]] = pad["token"]
+    snapshot["dossiers"] = [
+        {k: folder[k] for k in SNAPSHOT_FOLDER_KEYS if k in folder} for folder in page_props.get("dossiers", [])
+    ]
+    snapshot["pad_hashes"] = pad_hashes
+    return snapshot
+
+
+class AccountSnapshotCache:
+    """
+    Snapshots of the pads on the accounts (pad lists, folders and pad hashes), stored as JSON files
+    in `directory` and reused for `max_age` seconds.
+    """
+
+    def __init__(self, max_age=DEFAULT_CACHE_TTL, directory: Path = SNAPSHOT_DIRECTORY):
+        self.max_age = max_age
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def get_path(self, domain, username):
+        """
+        Return the path of the snapshot file of an account.
+        """
+        return self.directory / f"{get_cache_key(domain, username)}.json"
+
+    def _read(self, domain, username) -> "dict | None":
+        try:
+            snapshot = json.loads(self.get_path(domain, username).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        # JSON keys are always strings
+        snapshot["pad_hashes"] = {int(pad_id): pad_hash for pad_id, pad_hash in snapshot["pad_hashes"].items()}
+        return snapshot
+
+    def _write(self, domain, username, snapshot: dict):
+        path = self.get_path(domain, username)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(snapshot), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def get(self, domain, username) -> "dict | None":
+        """
+        Return the snapshot of an account, or `None` if it is missing or older than `max_age`.
+        """
+        if self.max_age <= 0:
+            return None
+        with self.lock:
+            snapshot = self._read(domain, username)
+        if not snapshot or time.time() - snapshot["time"] >= self.max_age:
+            return None
+        return snapshot
+
+    def set(self, domain, username, snapshot: dict):
+        """
+        Store the snapshot of an account (even if `max_age` is 0, so the next runs can use it).
+        """
+        with self.lock:
+            self._write(domain, username, {**snapshot, "time": time.time()})
+
+    def add_pad(self, domain, username, pad: dict, pad_list="padsCrees"):
+        """
+        Add a pad to the snapshot of an account, without changing the time of the snapshot.
+        """
+        with self.lock:
+            snapshot = self._read(domain, username)
+            if not snapshot:
+                return
+            snapshot[pad_list].append({k: pad[k] for k in SNAPSHOT_PAD_KEYS if k in pad})
+            snapshot["pad_hashes"][pad["id"]] = pad["token"]
+            self._write(domain, username, snapshot)
+
+    def invalidate(self, domain, username):
+        """
+        Delete the snapshot of an account.
+        """
+        with self.lock:
+            self.get_path(domain, username).unlink(True)
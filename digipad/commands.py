@@ -0,0 +1,417 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import unquote
+
+import click
+
+from . import __version__
+from .bulk import BulkExecutor, BulkReport
+from .cache import DEFAULT_CACHE_TTL
+from .fake_server import DEFAULT_BLOCKS, DEFAULT_EXPORT_SIZE, DEFAULT_PADS, DEFAULT_PASSWORD, DEFAULT_USERNAME
+from .ratelimit import DEFAULT_BURST, DEFAULT_RATE
+from .retry import DEFAULT_ATTEMPTS, DEFAULT_BACKOFF
+from .sockets import DEFAULT_SOCKET_POOL_SIZE
+from .utils import COOKIE_FILE, DEFAULT_POOL_SIZE, get_pads_table, get_secret_key
+
+
+@dataclass
+class Options:
+    """Global command line options."""
+
+    delay: float
+    cookie: str
+    domain: str
+    pool_size: int = DEFAULT_POOL_SIZE
+    socket_pool_size: int = DEFAULT_SOCKET_POOL_SIZE
+    cache_ttl: int = DEFAULT_CACHE_TTL
+    refresh: bool = False
+    rate: float = DEFAULT_RATE
+    burst: int = DEFAULT_BURST
+    retries: int = DEFAULT_ATTEMPTS
+    retry_backoff: float = DEFAULT_BACKOFF
+
+    def __post_init__(self):
+        self.set_delay(self.delay)
+
+    def set_delay(self, delay):
+        """Replace the rate limit with one operation every `delay` seconds (if `delay` is not 0)."""
+        if delay:
+            self.delay = delay
+            self.rate = 1 / delay
+            self.burst = 1
+
+
+pass_opts = click.make_pass_decorator(Options)
+
+
+def summarize(report: BulkReport):
+    """Print the summary of a bulk run and exit with an error code if an operation failed."""
+    if len(report) > 1 or report.failed:
+        print()
+        print(report.summary())
+    if report.failed:
+        click.get_current_context().exit(1)
+    return report
+
+
+def run_and_summarize(func, items, jobs, describe):
+    """Run an operation on all the items, print a summary and exit with an error code if an operation failed."""
+    return summarize(BulkExecutor(jobs, describe).run(func, items))
+
+
+def get_session(opts: Options):
+    """Return a session for the command line options, that is closed at the end of the command."""
+    from .session import Session
+
+    session = Session(opts)
+    click.get_current_context().call_on_close(session.close)
+    return session
+
+
+pad_argument = click.argument("PADS", nargs=-1, required=True)
+# kept for compatibility, the operations are limited by the rate limiter of the session
+delay_option = click.option(
+    "--delay",
+    type=float,
+    hidden=True,
+    expose_value=False,
+    callback=lambda ctx, _param, delay: ctx.find_object(Options).set_delay(delay),
+)
+jobs_option = click.option("-j", "--jobs", type=int, default=1, help="number of pads processed at the same time")
+
+
+@click.group()
+@click.version_option(__version__)
+@click.option("--delay", type=float, default=0, hidden=True)
+@click.option("--cookie", help="Digipad cookie")
+@click.option("--domain", "--instance", help="domain of Digipad instance")
+@click.option("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="number of HTTP connections kept alive")
+@click.option(
+    "--sockets",
+    "socket_pool_size",
+    type=int,
+    default=DEFAULT_SOCKET_POOL_SIZE,
+    help="number of socket connections shared by the pads",
+)
+@click.option(
+    "--cache-ttl",
+    type=int,
+    default=DEFAULT_CACHE_TTL,
+    help="number of seconds the user information and the pads list are cached (0 to disable the cache)",
+)
+@click.option("--refresh", is_flag=True, help="download the pads list again instead of using the cached one")
+@click.option(
+    "--rate",
+    type=float,
+    default=DEFAULT_RATE,
+    help="maximum number of operations per second, reduced when the instance returns errors (by default, no limit)",
+)
+@click.option("--burst", type=int, default=DEFAULT_BURST, help="number of operations that can be run at once")
+@click.option(
+    "--retries",
+    type=int,
+    default=DEFAULT_ATTEMPTS,
+    help="number of times an operation is tried before giving up (1 to disable retries)",
+)
+@click.option(
+    "--retry-backoff",
+    type=float,
+    default=DEFAULT_BACKOFF,
+    help="number of seconds to wait before the first retry, doubled after each retry",
+)
+@click.pass_context
+def cli(
+    ctx, delay, cookie, domain, pool_size, socket_pool_size, cache_ttl, refresh, rate, burst, retries, retry_backoff
+):  # pylint: disable=R0913
+    """Main command that handles the default parameters."""
+    ctx.obj = Options(
+        delay, cookie, domain, pool_size, socket_pool_size, cache_ttl, refresh, rate, burst, retries, retry_backoff
+    )
+
+
+@cli.command()
+@click.argument("TITLES", nargs=-1, required=True)
+@click.option("--template", help="pad to use as a template")
+@delay_option
+@jobs_option
+@pass_opts
+def create_pad(opts, titles, template, jobs):
+    """Create a pad."""
+    pads = get_session(opts).pads
+    run_and_summarize(
+        lambda pad_title: pads.create_pad(pad_title, template),
+        titles,
+        jobs,
+        lambda pad_title: f"Creating pad {pad_title}",
+    )
+
+
+@cli.command()
+@pad_argument
+@delay_option
+@click.option("--title", default="", help="title of the block")
+@click.option("--text", default="", help="text of the block", required=True)
+@click.option("--column-n", default=0, help="column number (starting from 0)")
+@click.option("--hidden", is_flag=True, help="if specified, hide the block")
+@click.option("--comment", help="comment to add to the block")
+@jobs_option
+@pass_opts
+def create_block(opts, pads, title, text, column_n, hidden, comment, jobs):
+    """Create a block in a pad."""
+    pads = get_session(opts).pads.get_all(pads)
+
+    def create(pad):
+        try:
+            block_id = pad.create_block(title, text, hidden, column_n)
+            if comment:
+                pad.comment_block(block_id, title, comment)
+            return block_id
+        finally:
+            pad.connection.close()
+
+    run_and_summarize(create, pads, jobs, lambda pad: f"Creating block{' and comment' if comment else ''} on {pad}")
+
+
+@cli.command()
+@pad_argument
+@delay_option
+@click.option("--title", required=True, help="title of the column")
+@click.option("--column-n", type=int, required=True, help="column number (starting from 0)")
+@jobs_option
+@pass_opts
+def rename_column(opts, pads, title, column_n, jobs):
+    """Rename a column in a pad."""
+    pads = get_session(opts).pads.get_all(pads)
+
+    def rename(pad):
+        try:
+            pad.rename_column(column_n, title)
+        finally:
+            pad.connection.close()
+
+    run_and_summarize(rename, pads, jobs, lambda pad: f"Renaming column on {pad}")
+
+
+@cli.command()
+@pad_argument
+@delay_option
+@click.option("-o", "--output", type=click.Path(file_okay=False, path_type=Path), help="output directory")
+@jobs_option
+@click.option(
+    "--download-jobs",
+    type=int,
+    help="number of archives downloaded at the same time (by default, the same as --jobs; one with --archive)",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="only export the pads that have changed since the last export in the output directory",
+)
+@click.option(
+    "--archive",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="ZIP file where all the pads are exported (instead of one file per pad in the output directory)",
+)
+@pass_opts
+def export(opts, pads, output, jobs, download_jobs, incremental, archive):
+    """Export pads.
+
+    The archives of --jobs pads are generated by the server while the previous ones are downloaded.
+    """
+    from .export import ExportArchive, ExportPipeline
+
+    if archive and (incremental or output):
+        raise click.UsageError("--archive can't be used with --incremental or --output")
+    if incremental:
+        # the revisions of the pads must be up to date
+        opts.refresh = True
+    pads = get_session(opts).pads.get_all(pads)
+    if not pads:
+        print("No pad to export")
+        return
+
+    def describe(pad):
+        return f"Exporting pad {pad}"
+
+    if archive:
+        with ExportArchive(archive) as export_archive:
+            report = ExportPipeline(jobs, download_jobs, describe=describe, archive=export_archive).run(pads)
+        print(f"Pads exported to {archive}")
+        summarize(report)
+        return
+
+    summarize(ExportPipeline(jobs, download_jobs, describe=describe, incremental=incremental).run(pads, output))
+
+
+@cli.command()
+@pad_argument
+@click.option("-f", "--format", type=click.Choice(["table", "json"]), default="table", help="output format")
+@click.option("-v", "--verbose", is_flag=True, help="print more information about pads")
+@pass_opts
+def list(opts, pads, format, verbose):  # pylint: disable=W0622
+    """List pads."""
+    pads = get_session(opts).pads.get_all(pads)
+    data = get_pads_table(pads, verbose, format == "json")
+
+    if format == "json":
+        import json
+
+        print(json.dumps(data))
+    else:
+        if not pads:
+            print("No pad")
+            return
+
+        from tabulate import tabulate
+
+        print(tabulate(data, headers="keys"))
+        print()
+        print(f"{len(pads)} {'pads' if len(pads) >= 2 else 'pad'}")
+
+
+@cli.command()
+@click.option("--username", prompt="Username")
+@click.option("--password", prompt="Password", hide_input=True)
+@click.option("--print-cookie", is_flag=True, help="print the cookie and don't save it")
+@pass_opts
+def login(opts, username, password, print_cookie):
+    """Log into Digipad and save the cookie."""
+    session = get_session(opts)
+    session.login(username, password)
+    userinfo = session.userinfo  # pylint: disable=W0621
+    if not userinfo:
+        raise ValueError("Not logged in, double-check your username and password")
+
+    print(f"Logged in as {userinfo}")
+    if print_cookie:
+        print(f"Cookie: {userinfo.cookie}")
+        return
+
+    COOKIE_FILE.write_text(userinfo.cookie, encoding="utf-8")
+    print(f"Cookie saved to {COOKIE_FILE}")
+
+
+@cli.command()
+@click.argument("COOKIE", required=False)
+@pass_opts
+def userinfo(opts, cookie):
+    """Print information about the current logged-in user or a specified cookie."""
+    session = get_session(opts)
+    if cookie:
+        session.cookie = cookie
+    userinfo = session.userinfo  # pylint: disable=W0621
+    print(f"Logged in as {userinfo}")
+    if not userinfo:
+        print("Anonymous session")
+
+
+@cli.command(help="Save the Digipad cookie for later use")
+@click.option("--cookie", prompt="Digipad cookie", hide_input=True)
+@pass_opts
+def set_cookie(opts, cookie):
+    """Save the Digipad cookie for later use."""
+    cookie = unquote(cookie)
+
+    session = get_session(opts)
+    session.cookie = cookie
+    userinfo = session.userinfo  # pylint: disable=W0621
+    if not userinfo:
+        raise ValueError("Not logged in")
+
+    print(f"Logged in as {userinfo}")
+    COOKIE_FILE.write_text(cookie, encoding="utf-8")
+    print(f"Cookie saved to {COOKIE_FILE}")
+
+
+@cli.command(help="Delete the Digipad cookie file and log out")
+@pass_opts
+def logout(opts):
+    """Handler for digipad logout."""
+    get_session(opts).logout()
+    COOKIE_FILE.unlink(True)
+    print("Logged out")
+
+
+@cli.command()
+@click.option("--open/--no-open", default=True, help="automatically open the browser")
+@click.option(
+    "-s",
+    "--secret-key",
+    default=Path.home() / ".digipad_secret_key",
+    type=click.Path(exists=False, dir_okay=False),
+    help="secret key or path to a file that contains it",
+)
+@click.option("-h", "--host", default="0.0.0.0", help="hostname where the app is run")
+@click.option("-p", "--port", type=int, default=5000, help="port on which the app is run")
+@click.option("--debug/--no-debug", default=False, help="run the app in debugging mode")
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(1),
+    help="serve the app with Gunicorn in this number of processes (by default, one per CPU with --threads)",
+)
+@click.option(
+    "-t",
+    "--threads",
+    type=click.IntRange(1),
+    help="serve the app with Gunicorn with this number of threads per process (by default, 8 with --workers)",
+)
+def web(open, secret_key, host, port, debug, workers, threads):  # pylint: disable=W0622,R0913
+    """Open the web interface."""
+    secret_key = get_secret_key(secret_key)
+    production = workers is not None or threads is not None
+    if production and debug:
+        raise click.UsageError("--debug can't be used with --workers or --threads")
+
+    if open and not os.getenv("WERKZEUG_RUN_MAIN"):
+        import webbrowser
+
+        webbrowser.open(f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}")
+
+    from .app import app
+
+    app.secret_key = secret_key
+    if not production:
+        app.run(host, port, debug)
+        return
+
+    from .app.server import serve
+
+    try:
+        serve(app, host, port, workers, threads)
+    except RuntimeError as err:
+        raise click.ClickException(str(err)) from err
+
+
+@cli.command()
+@click.option("-h", "--host", default="127.0.0.1", help="hostname where the instance is run")
+@click.option("-p", "--port", type=int, default=5001, help="port on which the instance is run")
+@click.option("--pads", type=click.IntRange(0), default=DEFAULT_PADS, help="number of pads on the account")
+@click.option(
+    "--folders", type=click.IntRange(0), help="number of folders on the account (by default, one for 20 pads)"
+)
+@click.option("--blocks", type=click.IntRange(0), default=DEFAULT_BLOCKS, help="number of blocks on each pad")
+@click.option("--latency", type=click.FloatRange(0), default=0, help="delay of each request and command, in seconds")
+@click.option("--error-rate", type=click.FloatRange(0, 1), default=0, help="proportion of the operations that fail")
+@click.option(
+    "--export-size",
+    type=click.IntRange(0),
+    default=DEFAULT_EXPORT_SIZE,
+    help="size of the files in the exported archives, in bytes",
+)
+@click.option("--username", default=DEFAULT_USERNAME, help="username of the account")
+@click.option("--password", default=DEFAULT_PASSWORD, help="password of the account")
+@click.option("--seed", type=int, default=0, help="seed of the generated data")
+def fake_server(host, port, **kwargs):
+    """Run a fake Digipad instance to test the client offline."""
+    from .fake_server import FakeDigipad
+
+    instance = FakeDigipad(**kwargs)
+    print(f"Fake Digipad instance on http://{host}:{port}")
+    print(f"Log in as {instance.username} / {instance.password} or use the cookie {instance.cookie}")
+    print(f"Example: digipad --instance http://{host}:{port} --cookie {instance.cookie} list")
+    try:
+        instance.serve(host, port)
+    except KeyboardInterrupt:
+        pass
@@ -1,21 +1,98 @@
 import datetime as dt
 import json
+import os
 import random
+import re
+import tempfile
 import time
 import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dataclasses import dataclass, field
 from pathlib import Path
-from urllib.parse import quote
+from typing import ClassVar
 
-import requests
-import socketio
+from .retry import RETRYABLE_STATUS_CODES, CommandError, CommandNotSentError, is_not_handled
+from .sockets import chain_future
+from .utils import CHUNK_SIZE, UserInfo, extract_data
 
-from .utils import UserInfo, extract_data
+COMMAND_TIMEOUT = 10
+# the commands that have the same effect when they are run twice
+IDEMPOTENT_COMMANDS = ("modifierbloc", "modifiertitre", "modifiertitrecolonne")
+# the keys of the pad data that change when the pad is modified
+REVISION_KEYS = ("modifie", "activite", "bloc")
+# the response of the server instead of the archive when the user is not logged in
+NOT_LOGGED_IN = b"non_connecte"
+UNSAFE_FILENAME_CHARACTERS = re.compile(r'[\x00-\x1f\\/:*?"<>|]')
+
+
+class ExportFile:
+    """
+    A temporary file in `directory` that receives an exported archive while it is downloaded,
+    and is then atomically moved to its final name (with `finish`). It is deleted if an error occurs.
+    """
+
+    def __init__(self, pad: "Pad", directory: "str | Path | None" = None):
+        self.pad = pad
+        self.directory = Path(directory or Path.cwd())
+        self.path: "Path | None" = None
+        self.file = None
+        self.head = b""
+
+    def __enter__(self):
+        fd, path = tempfile.mkstemp(".zip.part", f".{self.pad.id}_", self.directory)
+        self.path = Path(path)
+        self.file = os.fdopen(fd, "wb")
+        return self
+
+    def __exit__(self, exc, _value, _tb):
+        if not self.file.closed:
+            self.file.close()
+        if exc and self.path.exists():
+            self.path.unlink()
+
+    def write(self, chunk: bytes):
+        """
+        Write a chunk of the archive.
+        """
+        if len(self.head) <= len(NOT_LOGGED_IN):
+            # keep the first bytes to check if the response is an archive
+            self.head += chunk[: len(NOT_LOGGED_IN) + 1 - len(self.head)]
+        self.file.write(chunk)
+
+    def finish(self) -> Path:
+        """
+        Move the archive to its final name (with the title of the pad and the current date) and return its path.
+        """
+        self.file.close()
+        if self.head == NOT_LOGGED_IN:
+            raise ValueError("Not logged in")
+
+        title = self.pad.title
+        if not title:
+            # pad without metadata, read the title from the archive
+            with zipfile.ZipFile(self.path) as archive:
+                title = json.loads(archive.read("donnees.json"))["pad"]["titre"]
+
+        output_file = self.directory / get_export_filename(title, self.pad.id)
+        os.replace(self.path, output_file)
+        return output_file
+
+
+def get_export_filename(title, pad_id):
+    """
+    Return the name of the exported archive of a pad.
+    """
+    title = UNSAFE_FILENAME_CHARACTERS.sub("_", title).strip(". ")
+    return f"{title}_{pad_id}_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
 
 
 class PadConnection:
     """
     A connection on a pad that can run commands.
+
+    Commands can be submitted without waiting for the previous ones to be done:
+    their replies are routed by the event dispatcher of the socket.
     """
 
     def __init__(self, pad: "Pad", session=None):
@@ -34,7 +111,7 @@ class PadConnection:
 
     def connect(self):
         """
-        Connect to the pad.
+        Connect to the pad, with a socket of the socket pool of the session.
         """
         if self.socket:
             return self.socket
@@ -42,42 +119,109 @@ class PadConnection:
         if not self.session.userinfo:
             self.session.userinfo = self.session.get_anon_userinfo(self.pad.id, self.pad.hash)
 
-        socket = socketio.SimpleClient()
-        socket.connect(
-            self.session.domain,
-            headers={"Cookie": "digipad=" + quote(self.session.cookie)},
-        )
+        socket = self.session.sockets.acquire(self.pad.id)
+        try:
+            self.join(socket)
+        except Exception:
+            self.session.sockets.release(socket, self.pad.id)
+            raise
         self.socket = socket
-
-        self.run(
-            "connexion",
-            {
-                "pad": self.pad.id,
-                "identifiant": self.session.userinfo.username,
-                "nom": self.session.userinfo.name,
-            },
-        )
         return socket
 
+    def join(self, socket):
+        """
+        Join the room of the pad on a socket, if it has not already been joined.
+        """
+        with socket.lock:
+            if not socket.connected:
+                # the socket has been disconnected, reconnect it
+                socket.connect()
+            if self.pad.id in socket.rooms:
+                return
+            future = socket.send(
+                "connexion",
+                {
+                    "pad": self.pad.id,
+                    "identifiant": self.session.userinfo.username,
+                    "nom": self.session.userinfo.name,
+                },
+                pad_id=self.pad.id,
+                timeout=COMMAND_TIMEOUT,
+            )
+            self.wait(future, socket)
+            socket.rooms.add(self.pad.id)
+
     def close(self):
         """
-        Disconnect from the pad and remove the socket.
+        Leave the pad and give back the socket to the socket pool.
         """
         if self.socket:
-            self.socket.emit("sortie", (self.pad.id, self.userinfo.username))
-            self.socket.disconnect()
+            socket = self.socket
             self.socket = None
+            self.session.sockets.release(socket, self.pad.id)
 
-    def run(self, command, *args, expected=None):
+    def is_reply(self, data, block_id=None, values=None):
         """
-        Run a command on the pad.
+        Return `True` if the data of an event is about this pad (and this block, if there is a `block_id`),
+        and has the `values` that the command has sent (a dict), if they are in the data.
+
+        The events without a pad ID are accepted: the commands in flight on a socket are all on the same pad,
+        and the `values` tell the replies from the changes made by other users of the pads joined by the socket.
+        """
+        if not isinstance(data, dict):
+            return True
+        if block_id is not None and "bloc" in data and data["bloc"] != block_id:
+            return False
+        for key, value in (values or {}).items():
+            if key in data and str(data[key]) != str(value):
+                return False
+        for key in ("pad", "padId"):
+            if key in data and str(data[key]) != str(self.pad.id):
+                return False
+        return True
+
+    def submit(self, command, *args, expected=None, match=None) -> Future:
+        """
+        Send a command to the pad and return a future that will receive the data of its reply,
+        without waiting for the reply.
+
+        If the command can't be sent, a `CommandNotSentError` is raised.
+        """
+        from socketio import exceptions
+
+        try:
+            socket = self.connect()
+            if not socket.connected or self.pad.id not in socket.rooms:
+                self.join(socket)
+            return socket.send(command, args, expected, match or self.is_reply, self.pad.id, COMMAND_TIMEOUT)
+        except (OSError, exceptions.SocketIOError, CommandError) as err:
+            raise CommandNotSentError(f"Can't send command {command} on pad {self.pad} ({err})") from err
+
+    def wait(self, future: Future, socket=None):
         """
-        socket = self.connect()
-        socket.emit(command, args)
-        ret = socket.receive(timeout=10)
-        if ret[0] != (expected or command):
-            raise ValueError(f"Can't run command {command} on pad {self.pad} ({ret})")
-        return ret[1]
+        Wait for the reply of a command and return its data.
+
+        If the command fails or has no reply, a `CommandError` is raised.
+        """
+        from socketio import exceptions
+
+        try:
+            return future.result(timeout=COMMAND_TIMEOUT)
+        except FutureTimeoutError:
+            (socket or self.socket).dispatcher.cancel(future)
+            raise CommandError(f"No reply after {COMMAND_TIMEOUT} seconds") from None
+        except exceptions.SocketIOError as err:
+            raise CommandError(f"Disconnected ({err!r})") from err
+
+    def run(self, command, *args, expected=None, match=None):
+        """
+        Run a command on the pad and return the data of its reply.
+        """
+        future = self.submit(command, *args, expected=expected, match=match)
+        try:
+            return self.wait(future)
+        except CommandError as err:
+            raise CommandError(f"Can't run command {command} on pad {self.pad} ({err})") from err
 
 
 @dataclass
@@ -94,8 +238,11 @@ class Pad:
     columns: list[str] = field(default_factory=list)
     creator: UserInfo = field(default_factory=UserInfo)
     creation_date: "dt.datetime | None" = None
+    revision: "str | None" = None
     _connection: "PadConnection | None" = None
 
+    connection_class: ClassVar[type] = PadConnection
+
     def __hash__(self):
         return hash(self.id)
 
@@ -112,7 +259,7 @@ class Pad:
         The connection associated to the pad. One is automatically created when needed.
         """
         if self._connection is None:
-            self._connection = PadConnection(self)
+            self._connection = self.connection_class(self)
         return self._connection
 
     @connection.setter
@@ -123,9 +270,18 @@ class Pad:
         """
         Export a pad and return the path of the exported ZIP file.
         """
+        return self.download_export(self.generate_export(), directory)
+
+    def generate_export(self):
+        """
+        Ask the server to generate the archive of the pad and return its file name on the server.
+        """
+        return self.connection.session.retry("export", lambda _attempt: self._generate_export())
+
+    def _generate_export(self):
         if not self.connection.userinfo:
             raise ValueError("Not logged in")
-        req = requests.post(
+        req = self.connection.session.http.post(
             f"{self.connection.session.domain}/api/exporter-pad",
             json={"padId": self.id, "identifiant": self.connection.userinfo.username, "admin": ""},
             cookies={"digipad": self.connection.userinfo.cookie},
@@ -133,37 +289,72 @@ class Pad:
         req.raise_for_status()
         if req.text == "non_connecte":
             raise ValueError("Not logged in")
+        return req.text
 
-        filename = req.text
-        file = f"{self.connection.session.domain}/temp/" + filename
-        req2 = requests.get(file, stream=True)
-        req2.raise_for_status()
-        if req2.content == b"non_connecte":
-            raise ValueError("Not logged in")
+    def download_export(self, filename, directory=None):
+        """
+        Download an archive generated by `generate_export` and return its path.
+        """
+        return self.connection.session.retry("export", lambda _attempt: self._download_export(filename, directory))
 
-        output_file = (directory or Path.cwd()) / filename
-        with output_file.open("wb") as f:
-            for chunk in req2.iter_content(65536):
-                f.write(chunk)
+    def _download_export(self, filename, directory=None):
+        with ExportFile(self, directory) as output_file:
+            for chunk in self._iter_export(*self._open_export(filename)):
+                output_file.write(chunk)
+            return output_file.finish()
 
-        with zipfile.ZipFile(output_file) as archive:
-            data = json.loads(archive.read("donnees.json"))
-        output_file.rename(
-            output_file.parent / f"{data['pad']['titre']}_{self.id}_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-        )
-        return output_file
+    def iter_export(self, filename):
+        """
+        Start the download of an archive generated by `generate_export` and return an iterator over its chunks.
+
+        The response is checked before returning, so an error is raised if the user is not logged in.
+        """
+        return self._iter_export(*self.connection.session.retry("export", lambda _attempt: self._open_export(filename)))
 
-    def edit_block(self, title, text, hidden=False, column_n=0, block_id=None):
+    def _open_export(self, filename):
         """
-        Edit a block and return its ID.
+        Send the request that downloads an archive and return the response, its first bytes and the next chunks.
         """
-        command = "modifierbloc"
-        if not block_id:
-            block_id = f"bloc-id-{int(time.time() * 1000)}{random.randbytes(3).hex()[1:]}"
-            command = "ajouterbloc"
+        req = self.connection.session.http.get(f"{self.connection.session.domain}/temp/{filename}", stream=True)
+        try:
+            req.raise_for_status()
+            chunks = req.iter_content(CHUNK_SIZE)
+            head = b""
+            for chunk in chunks:
+                head += chunk
+                if len(head) > len(NOT_LOGGED_IN):
+                    break
+            if head == NOT_LOGGED_IN:
+                raise ValueError("Not logged in")
+        except BaseException:
+            req.close()
+            raise
+        return req, head, chunks
+
+    @staticmethod
+    def _iter_export(req, head, chunks):
+        with req:
+            if head:
+                yield head
+            yield from chunks
+
+    def edit_block(self, title, text, hidden=False, column_n=0, block_id=None, wait=True):
+        """
+        Edit a block and return its ID (or a future that will receive it if `wait` is `False`).
+        """
+        command = self._edit_block_command(title, text, hidden, column_n, block_id)
+        return self._submit(command, wait, lambda ret: ret["bloc"], block_id=command[1])
 
-        ret = self.connection.run(
-            command,
+    def _edit_block_command(self, title, text, hidden=False, column_n=0, block_id=None, create=None):
+        """
+        Return the command and the arguments that edit a block (or create it if there is no `block_id`).
+        """
+        if create is None:
+            create = not block_id
+        block_id = block_id or self.new_block_id()
+
+        return (
+            "ajouterbloc" if create else "modifierbloc",
             block_id,
             str(self.id),
             self.hash,
@@ -180,19 +371,29 @@ class Pad:
             self.connection.userinfo.username,
             self.connection.userinfo.name,
         )
-        return ret["bloc"]
 
-    def create_block(self, title, text, hidden=False, column_n=0):
+    @staticmethod
+    def new_block_id():
+        """
+        Return a new block ID, that can be given to `create_block` to send commands on the block before it is created.
+        """
+        return f"bloc-id-{int(time.time() * 1000)}{random.randbytes(3).hex()[1:]}"
+
+    def create_block(self, title, text, hidden=False, column_n=0, block_id=None, wait=True):
         """
-        Create a block and return its ID.
+        Create a block and return its ID (or a future that will receive it if `wait` is `False`).
         """
-        return self.edit_block(title, text, hidden, column_n, None)
+        command = self._edit_block_command(title, text, hidden, column_n, block_id, create=True)
+        return self._submit(command, wait, lambda ret: ret["bloc"], block_id=command[1])
 
-    def comment_block(self, block_id, title, text):
+    def comment_block(self, block_id, title, text, wait=True):
         """
         Add a comment on a block.
         """
-        self.connection.run(
+        return self._submit(self._comment_block_command(block_id, title, text), wait, block_id=block_id)
+
+    def _comment_block_command(self, block_id, title, text):
+        return (
             "commenterbloc",
             block_id,
             str(self.id),
@@ -203,11 +404,15 @@ class Pad:
             self.connection.userinfo.name,
         )
 
-    def rename_column(self, column_number, column_title):
+    def rename_column(self, column_number, column_title, wait=True):
         """
         Rename a column.
         """
-        self.connection.run(
+        command = self._rename_column_command(column_number, column_title)
+        return self._submit(command, wait, values={"titre": column_title, "colonne": column_number})
+
+    def _rename_column_command(self, column_number, column_title):
+        return (
             "modifiertitrecolonne",
             str(self.id),
             column_title,
@@ -215,17 +420,104 @@ class Pad:
             self.connection.userinfo.username,
         )
 
-    def rename(self, title):
+    def rename(self, title, wait=True):
         """
         Rename the pad.
         """
-        self.connection.run(
+
+        def renamed(_ret):
+            self.title = title
+
+        return self._submit(self._rename_command(title), wait, renamed, values={"titre": title})
+
+    def _rename_command(self, title):
+        return (
             "modifiertitre",
             str(self.id),
             title,
             self.connection.userinfo.username,
         )
 
+    def _submit(self, command, wait=True, on_reply=None, block_id=None, values=None):
+        """
+        Send a command on the connection of the pad, and return the result of `on_reply` called on its reply
+        (or a future that will receive it if `wait` is `False`). The reply is the next event about the pad
+        (and the block `block_id`) that has the `values` of the command.
+
+        If `wait` is `True`, the command is sent again if it fails, according to the retry policies of the session:
+        the commands that can't be run twice are only sent again if they haven't been sent,
+        except the block creations that are sent again if the block doesn't exist.
+        """
+        connection = self.connection
+
+        def match(data):
+            return connection.is_reply(data, block_id, values)
+
+        if not wait:
+            future = connection.submit(*command, match=match)
+            return future if on_reply is None else chain_future(future, on_reply)
+
+        def attempt(number):
+            if number > 1 and command[0] == "ajouterbloc" and self.block_exists(block_id):
+                # the block has been created by the previous attempt but the reply has been lost
+                return {"bloc": block_id}
+            try:
+                return connection.wait(connection.submit(*command, match=match))
+            except CommandError as err:
+                raise type(err)(f"Can't run command {command[0]} on pad {self} ({err})") from err
+
+        if command[0] in IDEMPOTENT_COMMANDS or command[0] == "ajouterbloc":
+            ret = connection.session.retry("command" if command[0] in IDEMPOTENT_COMMANDS else "create", attempt)
+        else:
+            ret = connection.session.retry("create", attempt, is_not_handled)
+        return ret if on_reply is None else on_reply(ret)
+
+    def get_data(self):
+        """
+        Return the data of the pad (with its blocks and its activity).
+        """
+        session = self.connection.session
+        req = session.http.post(
+            f"{session.domain}/api/recuperer-donnees-pad",
+            json={
+                "id": self.id,
+                "token": self.hash,
+                "identifiant": self.connection.userinfo.username,
+                "statut": "auteur" if self.connection.userinfo else "invite",
+            },
+            cookies={"digipad": self.connection.userinfo.cookie},
+        )
+        req.raise_for_status()
+        return req.json()
+
+    def block_exists(self, block_id):
+        """
+        Return `True` if a block exists on the pad.
+        """
+        return any(block.get("bloc") == block_id for block in self.get_data().get("blocs", []))
+
+
+def parse_pad_url(pad_id: "int | str"):
+    """
+    Return the ID and the hash (or an empty string) of a pad from its ID or its URL.
+    """
+    pad_hash = ""
+    if not isinstance(pad_id, int):
+        try:
+            pad_id = int(pad_id)
+        except ValueError:
+            url = pad_id
+            try:
+                *_, pad_id, pad_hash = str(pad_id).rstrip("/").split("/")
+                if pad_id == "p":
+                    # incomplete URL without hash
+                    pad_id = pad_hash
+                    pad_hash = ""
+                pad_id = int(pad_id)
+            except ValueError as err:
+                raise ValueError(f"Could not extract pad ID from the URL {url}") from err
+    return pad_id, pad_hash
+
 
 class PadList(list[Pad]):
     """A list of pads that can be searched for a specific pad."""
@@ -238,37 +530,50 @@ class PadList(list[Pad]):
 
     def get(self, pad_id, session=None):
         """Search for a pad in the list and return it, otherwise create a `Pad` object without metadata."""
-        pad_hash = ""
-        if not isinstance(pad_id, int):
-            try:
-                pad_id = int(pad_id)
-            except ValueError:
-                url = pad_id
-                try:
-                    *_, pad_id, pad_hash = str(pad_id).rstrip("/").split("/")
-                    if pad_id == "p":
-                        # incomplete URL without hash
-                        pad_id = pad_hash
-                        pad_hash = ""
-                    pad_id = int(pad_id)
-                except ValueError as err:
-                    raise ValueError(f"Could not extract pad ID from the URL {url}") from err
+        pad_id, pad_hash = parse_pad_url(pad_id)
 
         for pad in self:
             if pad.id == pad_id:
                 return pad
 
+        return self._get_pad_info_with_connection(pad_id, pad_hash, session)
+
+    def _get_pad_info_with_connection(self, pad_id, pad_hash, session=None):
         pad = self.get_pad_info(pad_id, pad_hash, session=session)
         if session:
             pad.connection = PadConnection(pad, session)
         return pad
 
+    def get_pads_info(self, pad_hashes: "dict[int, str]", session=None, jobs=None) -> "dict[int, Pad]":
+        """
+        Return information about several pads (from a dict that maps their IDs to their hashes),
+        fetching at most `jobs` of them at the same time (by default, the pool size of the session).
+        """
+        if not pad_hashes:
+            return {}
+
+        jobs = min(jobs or self.session.pool_size, len(pad_hashes))
+        with ThreadPoolExecutor(jobs) as executor:
+            pads = executor.map(
+                lambda item: self._get_pad_info_with_connection(*item, session),
+                pad_hashes.items(),
+            )
+            return {pad_id: pad for pad_id, pad in zip(pad_hashes, pads)}
+
     def get_pad_info(self, pad_id, pad_hash, pad_hashes=None, session=None):
         """
         Return information about a pad from its ID and its hash.
         """
+
+        def attempt(_number):
+            req = self.session.http.get(f"{self.session.domain}/p/{pad_id}/{pad_hash}", stream=True)
+            if req.status_code in RETRYABLE_STATUS_CODES:
+                req.close()
+                req.raise_for_status()
+            return req
+
         try:
-            req = requests.get(f"{self.session.domain}/p/{pad_id}/{pad_hash}")
+            req = self.session.retry("read", attempt)
         except OSError:
             return Pad(pad_id, pad_hash)
 
@@ -280,15 +585,23 @@ class PadList(list[Pad]):
         return format_pads([page_props["pad"]], pad_hashes, session)[0]
 
 
-def format_pads(pads: list[dict], pad_hashes=None, session=None) -> PadList:
+def get_revision(pad: dict):
+    """
+    Return a marker that changes when the pad is modified (from the data of the pad), or `None` if there is none.
+    """
+    values = [f"{key}={pad[key]}" for key in REVISION_KEYS if pad.get(key) is not None]
+    return "|".join(values) or None
+
+
+def format_pads(pads: list[dict], pad_hashes=None, session=None, pad_class=Pad) -> PadList:
     """
     Returns a dict that maps pad IDs to pad titles from a Digipad dict.
     """
-    ret = PadList()
+    ret = PadList(session=session)
     for pad in pads:
-        if pad_hashes:
+        if pad_hashes is not None:
             pad_hashes[pad["id"]] = pad["token"]
-        pad = Pad(
+        pad = pad_class(
             id=pad["id"],
             hash=pad["token"],
             title=pad["titre"],
@@ -297,8 +610,9 @@ def format_pads(pads: list[dict], pad_hashes=None, session=None) -> PadList:
             columns=json.loads(pad["colonnes"]) if isinstance(pad["colonnes"], str) else pad["colonnes"],
             creator=UserInfo.from_json(pad),
             creation_date=dt.datetime.fromisoformat(pad["date"]),
+            revision=get_revision(pad),
         )
         if session:
-            pad.connection = PadConnection(pad, session)
+            pad.connection = pad_class.connection_class(pad, session)
         ret.append(pad)
     return ret
@@ -0,0 +1,316 @@
+import datetime as dt
+import hashlib
+import io
+import json
+import os
+import queue
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterable
+
+from .bulk import BulkExecutor, BulkReport, BulkResult
+from .edit import Pad, get_export_filename
+from .utils import CHUNK_SIZE
+
+# marks the end of the pads in the queue between the stages
+END = object()
+MANIFEST_FILE = ".digipad_manifest.json"
+
+
+def get_checksum(path: Path):
+    """
+    Return the SHA-256 checksum of a file.
+    """
+    checksum = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class ExportManifest:
+    """
+    The list of the pads exported in a directory (with their title, the name and the checksum of their archive
+    and their revision when they were exported), stored in the directory to export only the pads that have changed.
+    """
+
+    def __init__(self, directory: "str | Path | None" = None):
+        self.directory = Path(directory or Path.cwd())
+        self.path = self.directory / MANIFEST_FILE
+        self.lock = threading.Lock()
+        try:
+            self.pads: dict[str, dict] = json.loads(self.path.read_text(encoding="utf-8"))["pads"]
+        except (OSError, ValueError, KeyError):
+            self.pads = {}
+
+    def is_up_to_date(self, pad: Pad):
+        """
+        Return `True` if the archive of a pad has been exported since the last modification of the pad.
+        """
+        entry = self.pads.get(str(pad.id))
+        return (
+            entry is not None
+            and pad.revision is not None
+            and entry["revision"] == pad.revision
+            and (self.directory / entry["file"]).exists()
+        )
+
+    def get_path(self, pad: Pad):
+        """
+        Return the path of the archive of a pad.
+        """
+        return self.directory / self.pads[str(pad.id)]["file"]
+
+    def add(self, pad: Pad, path: Path):
+        """
+        Record the new archive of a pad and return its path.
+
+        If the archive hasn't changed, it is deleted and the previous one is kept;
+        otherwise the previous one is deleted.
+        """
+        checksum = get_checksum(path)
+        with self.lock:
+            entry = self.pads.get(str(pad.id))
+            if entry is not None and entry["file"] != path.name:
+                previous = self.directory / entry["file"]
+                if entry["checksum"] == checksum and previous.exists():
+                    path.unlink()
+                    path = previous
+                else:
+                    previous.unlink(True)
+            self.pads[str(pad.id)] = {
+                "id": pad.id,
+                "title": pad.title,
+                "file": path.name,
+                "checksum": checksum,
+                "revision": pad.revision,
+                "exported": dt.datetime.now().isoformat(timespec="seconds"),
+            }
+        return path
+
+    def save(self):
+        """
+        Write the manifest in the directory.
+        """
+        with self.lock:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps({"pads": self.pads}, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+class ExportArchive:
+    """
+    A ZIP file that receives the archives of several pads while they are downloaded, one at a time.
+
+    The archives are stored without compression (they are already compressed), so each byte is written once.
+    A download that fails before its first bytes leaves nothing in the ZIP file, but a download that is
+    interrupted leaves a truncated archive (and the pad is reported as failed).
+    """
+
+    def __init__(self, path: "str | Path"):
+        self.path = Path(path)
+        self.zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_STORED, allowZip64=True)
+        self.names: set[str] = set()
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def add(self, pad: Pad, filename):
+        """
+        Download an archive generated by `Pad.generate_export` into the ZIP file and return its name in the ZIP file.
+        """
+        # the download is checked before its entry is created
+        chunks = pad.iter_export(filename)
+        name = get_export_filename(pad.title or f"pad_{pad.id}", pad.id)
+        # only one file can be written at the same time
+        with self.lock:
+            while name in self.names:
+                name = "_" + name
+            self.names.add(name)
+            with self.zip.open(name, "w", force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+        return name
+
+    def close(self):
+        """
+        Write the end of the ZIP file.
+        """
+        with self.lock:
+            self.zip.close()
+
+
+class ZipStream(io.RawIOBase):
+    """
+    An unseekable file that keeps what is written into it until it is read with `pop`,
+    so a ZIP file can be sent while it is written.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):  # type: ignore
+        self.buffer += b
+        self.position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.position
+
+    def pop(self):
+        """
+        Return what has been written since the last call and forget it.
+        """
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def stream_zip(files: "Iterable[tuple[str, Path]]"):
+    """
+    Write the `files` (tuples of a name and a path) into a ZIP file without compression (they are already compressed)
+    and yield it chunk by chunk, without keeping it in memory nor writing it on disk.
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, path in files:
+            with path.open("rb") as f, archive.open(zipfile.ZipInfo.from_file(path, name), "w") as entry:
+                for chunk in iter(lambda f=f: f.read(CHUNK_SIZE), b""):
+                    entry.write(chunk)
+                    yield stream.pop()
+            yield stream.pop()
+    yield stream.pop()
+
+
+class ExportPipeline:
+    """
+    Export pads in two stages that overlap: `generate_jobs` threads ask the server to generate the archives
+    and `download_jobs` threads download them, so the server generates an archive while the previous ones
+    are downloaded. The results are reported by a `BulkExecutor` (with `describe` and `on_result`).
+
+    The generated archives wait in a queue of at most `queue_size` archives (by default, twice `download_jobs`);
+    when it is full, the generation waits for the downloads.
+
+    If `incremental` is true, the pads that haven't changed since they have been exported in the same directory
+    are skipped (according to the `ExportManifest` of the directory) and the archives that haven't changed
+    are not replaced.
+
+    If an `archive` is given, the archives are downloaded into it instead of into `directory`,
+    one at a time (`download_jobs` is ignored).
+    """
+
+    def __init__(
+        self,
+        generate_jobs=1,
+        download_jobs=None,
+        queue_size=None,
+        describe=None,
+        incremental=False,
+        archive: "ExportArchive | None" = None,
+        on_result=None,
+    ):  # pylint: disable=R0913
+        self.executor = BulkExecutor(generate_jobs, describe, on_result)
+        if incremental and archive:
+            raise ValueError("An incremental export can't be written into an archive")
+        self.download_jobs = 1 if archive else max(download_jobs or generate_jobs, 1)
+        self.queue_size = queue_size or 2 * self.download_jobs
+        self.incremental = incremental
+        self.archive = archive
+
+    def download(self, pad: Pad, filename, directory=None, manifest: "ExportManifest | None" = None):
+        """
+        Download an archive generated by `Pad.generate_export` and return its path (or its name in the `archive`).
+        """
+        if self.archive:
+            return self.archive.add(pad, filename)
+        path = pad.download_export(filename, directory)
+        return manifest.add(pad, path) if manifest else path
+
+    def run(self, pads: "Iterable[Pad]", directory: "str | Path | None" = None) -> BulkReport:
+        """
+        Export all the `pads` into `directory` (or into the `archive`) and return the report of the run,
+        with the paths of the archives.
+        """
+        pads = list(pads)
+        start = time.perf_counter()
+        results: "list[BulkResult | None]" = [None] * len(pads)
+        manifest = ExportManifest(directory) if self.incremental else None
+        to_generate: "queue.Queue[int]" = queue.Queue()
+        for i, pad in enumerate(pads):
+            if manifest and manifest.is_up_to_date(pad):
+                results[i] = BulkResult(pad, manifest.get_path(pad), skipped=True)
+                self.executor.report(results[i])
+            else:
+                to_generate.put(i)
+        to_download: queue.Queue = queue.Queue(self.queue_size)
+
+        def finish(i, started, value=None, error=None):
+            results[i] = BulkResult(pads[i], value, error, time.perf_counter() - started)
+            self.executor.report(results[i])
+
+        def generate():
+            while True:
+                try:
+                    i = to_generate.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.perf_counter()
+                try:
+                    filename = pads[i].generate_export()
+                except Exception as err:  # pylint: disable=W0718
+                    finish(i, started, error=err)
+                    continue
+                to_download.put((i, started, filename))
+
+        def download():
+            while True:
+                item = to_download.get()
+                if item is END:
+                    return
+                i, started, filename = item
+                try:
+                    finish(i, started, self.download(pads[i], filename, directory, manifest))
+                except Exception as err:  # pylint: disable=W0718
+                    finish(i, started, error=err)
+
+        generators = [threading.Thread(target=generate) for _ in range(min(self.executor.jobs, len(pads)))]
+        downloaders = [threading.Thread(target=download) for _ in range(min(self.download_jobs, len(pads)))]
+        for thread in generators + downloaders:
+            thread.start()
+        for thread in generators:
+            thread.join()
+        for _ in downloaders:
+            to_download.put(END)
+        for thread in downloaders:
+            thread.join()
+        if manifest:
+            manifest.save()
+
+        return BulkReport(results, time.perf_counter() - start)  # type: ignore
+
+
+def export_pads(
+    pads, directory=None, generate_jobs=1, download_jobs=None, describe=None, incremental=False, archive=None
+) -> BulkReport:
+    """
+    Export pads with an `ExportPipeline` and return the report of the run.
+
+    If an `archive` path is given, all the archives are written into this ZIP file.
+    """
+    if archive is None:
+        return ExportPipeline(generate_jobs, download_jobs, describe=describe, incremental=incremental).run(
+            pads, directory
+        )
+    with ExportArchive(archive) as export_archive:
+        return ExportPipeline(generate_jobs, download_jobs, describe=describe, archive=export_archive).run(pads)
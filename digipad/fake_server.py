@@ -0,0 +1,541 @@
+import datetime as dt
+import json
+import random
+import threading
+import time
+import typing
+from urllib.parse import unquote
+
+if typing.TYPE_CHECKING:
+    from .session import Session
+
+DEFAULT_PADS = 20
+DEFAULT_BLOCKS = 5
+DEFAULT_EXPORT_SIZE = 1024**2
+DEFAULT_USERNAME = "enseignant"
+DEFAULT_PASSWORD = "motdepasse"
+# the date of the pads and blocks of the initial account
+START_DATE = dt.datetime(2020, 1, 1)
+
+PAGE_HEAD = (
+    '<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8"><title>Digipad</title>'
+    '<link rel="stylesheet" href="/assets/static/style.css"></head><body><div id="app"></div>'
+)
+PAGE_TAIL = '<script src="/assets/entries/entry-client-routing.js" type="module" async></script></body></html>'
+
+
+class FakeDigipad:
+    """
+    A local stand-in for a Digipad instance, that keeps its data in memory, to test and benchmark the client
+    (or the web app) without network access.
+
+    The instance has a user account (`username` and `password`) with `pads` pads (60% created, 30% joined
+    and 10% as an administrator), `folders` folders (by default one for 20 pads) and `blocks` blocks on each pad.
+    The exported archives contain the data of the pad and `export_size` bytes of files.
+
+    Each HTTP request and socket command waits for `latency` seconds, and the operations (the API requests,
+    the export downloads and the socket commands) fail with a probability of `error_rate`,
+    with a 503 error or an `erreur` event.
+
+    The instance is served in a background thread with `start` (or in a `with` block), or in the current thread
+    with `serve`. `cookie` is the cookie of a logged-in session of the account.
+    """
+
+    def __init__(
+        self,
+        pads=DEFAULT_PADS,
+        folders=None,
+        blocks=DEFAULT_BLOCKS,
+        latency=0.0,
+        error_rate=0.0,
+        export_size=DEFAULT_EXPORT_SIZE,
+        username=DEFAULT_USERNAME,
+        password=DEFAULT_PASSWORD,
+        seed=0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.export_size = export_size
+        self.username = username
+        self.password = password
+        self.name = username.title()
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+
+        self.pads: dict[int, dict] = {}
+        self.blocks: dict[int, list[dict]] = {}
+        self.activity: dict[int, list[dict]] = {}
+        self.created: list[int] = []
+        self.joined: list[int] = []
+        self.admins: list[int] = []
+        self.favorites: list[int] = []
+        self.folders: list[dict] = []
+        self.sessions: dict[str, str] = {}
+        self.exports: dict[str, int] = {}
+        self._export_data = None
+
+        self._populate(pads, max(1, pads // 20) if folders is None else folders, blocks)
+        self.cookie = self.new_session(username)
+
+        self.sio = None
+        self.wsgi_app = self._make_app()
+        self.server = None
+        self.thread: "threading.Thread | None" = None
+
+    def __enter__(self):
+        if self.server is None:
+            self.start()
+        return self
+
+    def __exit__(self, *_args):
+        self.stop()
+
+    @property
+    def url(self):
+        """
+        The URL of the instance, once it has been started.
+        """
+        if self.server is None:
+            raise RuntimeError("The fake Digipad instance is not running")
+        return f"http://{self.server.host}:{self.server.port}"
+
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Serve the instance in a background thread (on a free port by default) and return its URL.
+        """
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietRequestHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server(host, port, self.wsgi_app, threaded=True, request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-digipad", daemon=True)
+        self.thread.start()
+        return self.url
+
+    def serve(self, host="127.0.0.1", port=0):
+        """
+        Serve the instance in the current thread until it is interrupted.
+        """
+        from werkzeug.serving import make_server
+
+        self.server = make_server(host, port, self.wsgi_app, threaded=True)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.server = None
+
+    def stop(self):
+        """
+        Stop serving the instance.
+        """
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+        self.server = None
+        self.thread = None
+
+    def session(self, **kwargs) -> "Session":
+        """
+        Return a session logged into the account of the instance (the instance must be running).
+        """
+        from .session import Session
+
+        return Session(self.cookie, domain=self.url, **kwargs)
+
+    def new_session(self, username=None):
+        """
+        Return the cookie of a new session (logged into the account of `username` if it is given).
+        """
+        cookie = f"s:{self.random.getrandbits(128):032x}"
+        with self.lock:
+            self.sessions[cookie] = username or ""
+        return cookie
+
+    def _populate(self, n_pads, n_folders, n_blocks):
+        """
+        Create the pads, the blocks and the folders of the account.
+        """
+        for pad_id in range(1, n_pads + 1):
+            date = START_DATE + dt.timedelta(minutes=self.random.randrange(2_000_000))
+            self.add_pad(f"Pad {pad_id}", date=date, blocks=n_blocks)
+
+        visited_start = n_pads * 6 // 10
+        admin_start = n_pads * 9 // 10
+        ids = list(self.pads)
+        self.created = ids[:visited_start]
+        self.joined = ids[visited_start:admin_start]
+        self.admins = ids[admin_start:]
+        self.favorites = self.random.sample(ids, min(len(ids), 10))
+        self.folders = [
+            {"id": f"dossier-{i}", "nom": f"Dossier {i}", "pads": self.random.sample(ids, min(len(ids), 20))}
+            for i in range(1, n_folders + 1)
+        ]
+
+    def add_pad(self, title, columns=("Colonne 1", "Colonne 2", "Colonne 3"), date=None, blocks=0):
+        """
+        Add a pad to the instance (but not to the account) and return its data.
+        """
+        date = (date or dt.datetime.now()).isoformat()
+        with self.lock:
+            pad_id = len(self.pads) + 1
+            pad = {
+                "id": pad_id,
+                "token": f"{self.random.getrandbits(64):016x}",
+                "titre": title,
+                "identifiant": self.username,
+                "nom": self.name,
+                "fond": "/img/fond1.png",
+                "acces": "public",
+                "code": self.random.randrange(1000, 9999),
+                "contributions": "ouvertes",
+                "affichage": "colonnes",
+                "registreActivite": "active",
+                "commentaires": "actives",
+                "ordre": "croissant",
+                "colonnes": json.dumps(list(columns)),
+                "affichageColonnes": json.dumps([True] * len(columns)),
+                "bloc": 0,
+                "activite": 0,
+                "admins": [],
+                "vues": 0,
+                "date": date,
+                "modifie": date,
+            }
+            self.pads[pad_id] = pad
+            self.blocks[pad_id] = []
+            self.activity[pad_id] = []
+            for n in range(blocks):
+                self.add_block(
+                    pad_id,
+                    f"bloc-id-{pad_id}-{n}",
+                    {"titre": f"Bloc {n + 1}", "texte": f"<p>Texte du bloc {n + 1}</p>", "colonne": n % len(columns)},
+                    self.username,
+                    self.name,
+                    date,
+                )
+            return pad
+
+    def add_block(self, pad_id, block_id, fields: dict, username, name, date=None):
+        """
+        Add a block to a pad and return its data.
+        """
+        date = date or dt.datetime.now().isoformat()
+        block = {
+            "titre": "",
+            "texte": "",
+            "media": "",
+            "iframe": "",
+            "type": "",
+            "source": "",
+            "vignette": "",
+            "couleur": "",
+            "colonne": 0,
+            "visibilite": "visible",
+            "commentaires": 0,
+            **fields,
+            "bloc": block_id,
+            "identifiant": username,
+            "nom": name,
+            "date": date,
+        }
+        with self.lock:
+            self.blocks[pad_id].append(block)
+            self.pads[pad_id]["bloc"] += 1
+            self._log(pad_id, "bloc-ajoute", block_id, username, date)
+        return block
+
+    def _log(self, pad_id, activity_type, block_id, username, date=None):
+        """
+        Add an entry to the activity of a pad and mark it as modified.
+        """
+        date = date or dt.datetime.now().isoformat()
+        with self.lock:
+            self.activity[pad_id].append(
+                {"id": len(self.activity[pad_id]) + 1, "bloc": block_id, "identifiant": username, "type": activity_type}
+            )
+            self.pads[pad_id]["activite"] += 1
+            self.pads[pad_id]["modifie"] = date
+
+    def get_username(self, cookie):
+        """
+        Return the username of the account of a session cookie, or an empty string.
+        """
+        return self.sessions.get(unquote(cookie or ""), "")
+
+    def account_props(self):
+        """
+        Return the `pageProps` of the account page.
+        """
+        with self.lock:
+            return {
+                "identifiant": self.username,
+                "nom": self.name,
+                "email": f"{self.username}@example.com",
+                "langue": "fr",
+                "statut": "utilisateur",
+                "padsCrees": [self.pads[pad_id] for pad_id in self.created],
+                "padsRejoints": [self.pads[pad_id] for pad_id in self.joined],
+                "padsAdmins": [self.pads[pad_id] for pad_id in self.admins],
+                "padsFavoris": [self.pads[pad_id] for pad_id in self.favorites],
+                "dossiers": self.folders,
+            }
+
+    def user_props(self, username):
+        """
+        Return the user information of the pages seen by `username` (or by an anonymous user).
+        """
+        if username == self.username:
+            return {"identifiant": self.username, "nom": self.name, "langue": "fr", "statut": "utilisateur"}
+        return {"identifiant": f"u{self.random.getrandbits(32):08x}", "nom": "", "langue": "fr", "statut": "invite"}
+
+    @staticmethod
+    def page(page_props: dict):
+        """
+        Return the HTML code of a Digipad page containing the given data.
+        """
+        data = json.dumps({"pageProps": page_props}, ensure_ascii=False)
+        return f'{PAGE_HEAD}<script id="vike_pageContext" type="application/json">{data}</script>{PAGE_TAIL}'
+
+    def export_archive(self, pad_id):
+        """
+        Return the content of the exported archive of a pad.
+        """
+        import io
+        import zipfile
+
+        if self._export_data is None or len(self._export_data) != self.export_size:
+            self._export_data = random.Random(self.export_size).randbytes(self.export_size)
+
+        with self.lock:
+            data = {"pad": self.pads[pad_id], "blocs": self.blocks[pad_id], "activite": self.activity[pad_id]}
+            data = json.dumps(data, ensure_ascii=False)
+
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+            archive.writestr("donnees.json", data)
+            if self.export_size:
+                archive.writestr("fichiers/fichier.bin", self._export_data)
+        return stream.getvalue()
+
+    def should_fail(self):
+        """
+        Wait for the latency of the instance and return `True` if the operation must fail.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        return self.random.random() < self.error_rate
+
+    def _make_app(self):
+        """
+        Return the WSGI application of the instance (a Flask app wrapped by a socket.io server).
+        """
+        import socketio
+        from flask import Flask, Response, abort, redirect, request
+
+        app = Flask(__name__)
+        self.sio = sio = socketio.Server(async_mode="threading")
+
+        @app.before_request
+        def delay():
+            # the pages don't fail, so the user information and the pad information can always be read
+            if self.should_fail() and request.path.startswith(("/api/", "/temp/")):
+                return Response("Service Unavailable", 503)
+            return None
+
+        @app.get("/")
+        def home():
+            username = self.get_username(request.cookies.get("digipad"))
+            if username:
+                return redirect(f"/u/{username}")
+            return self.page({})
+
+        @app.get("/u/<username>")
+        def account(username):
+            if username != self.username or self.get_username(request.cookies.get("digipad")) != username:
+                # not logged in: redirected to the home page
+                return redirect("/")
+            return self.page(self.account_props())
+
+        @app.get("/p/<int:pad_id>/<pad_hash>")
+        def pad_page(pad_id, pad_hash):
+            cookie = request.cookies.get("digipad")
+            props = self.user_props(self.get_username(cookie))
+            with self.lock:
+                pad = self.pads.get(pad_id)
+                if pad is not None and pad["token"] == pad_hash:
+                    props = {**props, "pad": pad, "blocs": self.blocks[pad_id]}
+            response = Response(self.page(props))
+            if not cookie:
+                response.set_cookie("digipad", self.new_session())
+            return response
+
+        @app.post("/api/connexion")
+        def login():
+            data = request.get_json()
+            if data.get("identifiant") != self.username or data.get("motdepasse") != self.password:
+                return "erreur_connexion"
+            response = Response("identifiant_valide")
+            response.set_cookie("digipad", self.new_session(self.username))
+            return response
+
+        @app.post("/api/creer-pad")
+        def create_pad():
+            if not self.get_username(request.cookies.get("digipad")):
+                return "non_connecte"
+            pad = self.add_pad(request.get_json()["titre"])
+            with self.lock:
+                self.created.append(pad["id"])
+            return pad
+
+        @app.post("/api/dupliquer-pad")
+        def copy_pad():
+            if not self.get_username(request.cookies.get("digipad")):
+                return "non_connecte"
+            with self.lock:
+                original = self.pads.get(int(request.get_json()["padId"]))
+                if original is None:
+                    abort(404)
+                pad = self.add_pad(f"Copie de {original['titre']}", json.loads(original["colonnes"]))
+                for block in self.blocks[original["id"]]:
+                    self.add_block(pad["id"], f"{block['bloc']}-{pad['id']}", block, self.username, self.name)
+                self.created.append(pad["id"])
+            return pad
+
+        @app.post("/api/exporter-pad")
+        def export_pad():
+            if not self.get_username(request.cookies.get("digipad")):
+                return "non_connecte"
+            pad_id = int(request.get_json()["padId"])
+            with self.lock:
+                if pad_id not in self.pads:
+                    abort(404)
+                name = f"{pad_id}-{self.random.getrandbits(64):016x}.zip"
+                self.exports[name] = pad_id
+            return name
+
+        @app.get("/temp/<name>")
+        def download_export(name):
+            if name not in self.exports:
+                abort(404)
+            return Response(self.export_archive(self.exports[name]), mimetype="application/zip")
+
+        @app.post("/api/recuperer-donnees-pad")
+        def pad_data():
+            data = request.get_json()
+            with self.lock:
+                pad = self.pads.get(int(data["id"]))
+                if pad is None or pad["token"] != data.get("token"):
+                    abort(404)
+                return {"pad": pad, "blocs": self.blocks[pad["id"]], "activite": self.activity[pad["id"]]}
+
+        self._add_events(sio)
+        return socketio.WSGIApp(sio, app)
+
+    def _add_events(self, sio):
+        """
+        Add the socket.io events of the instance to a server.
+        """
+        users: dict[str, str] = {}
+
+        def command(func):
+            # run a command after the latency, and reply with an error if it fails or if its data is invalid
+            def handler(sid, *args):
+                if self.should_fail():
+                    sio.emit("erreur", "erreur_serveur", to=sid)
+                    return
+                try:
+                    func(sid, *args)
+                except (KeyError, IndexError, TypeError, ValueError, StopIteration):
+                    sio.emit("erreur", "donnees_invalides", to=sid)
+
+            sio.on(func.__name__, handler)
+            return func
+
+        @sio.on("connect")
+        def connect(sid, environ, *_args):
+            from werkzeug.http import parse_cookie
+
+            users[sid] = self.get_username(parse_cookie(environ.get("HTTP_COOKIE", "")).get("digipad"))
+
+        @sio.on("disconnect")
+        def disconnect(sid, *_args):
+            users.pop(sid, None)
+
+        @command
+        def connexion(sid, data):
+            pad_id = int(data["pad"])
+            if pad_id not in self.pads:
+                raise KeyError(pad_id)
+            sio.enter_room(sid, f"pad-{pad_id}")
+            sio.emit("connexion", [{"identifiant": data["identifiant"], "nom": data["nom"]}], to=f"pad-{pad_id}")
+
+        @sio.on("sortie")
+        def sortie(sid, pad_id, *_args):
+            sio.leave_room(sid, f"pad-{int(pad_id)}")
+
+        def block_fields(*args):
+            title, text, media, iframe, block_type, source, thumbnail, color, column, hidden = args
+            return {
+                "titre": title,
+                "texte": text,
+                "media": media,
+                "iframe": iframe,
+                "type": block_type,
+                "source": source,
+                "vignette": thumbnail,
+                "couleur": color,
+                "colonne": int(column),
+                "visibilite": "privee" if hidden else "visible",
+            }
+
+        @command
+        def ajouterbloc(sid, block_id, pad_id, _token, *args):
+            pad_id = int(pad_id)
+            username, name = args[10], args[11]
+            block = self.add_block(pad_id, block_id, block_fields(*args[:10]), users.get(sid) or username, name)
+            sio.emit("ajouterbloc", block, to=f"pad-{pad_id}")
+
+        @command
+        def modifierbloc(sid, block_id, pad_id, _token, *args):
+            pad_id = int(pad_id)
+            with self.lock:
+                block = next(block for block in self.blocks[pad_id] if block["bloc"] == block_id)
+                block.update(block_fields(*args[:10]))
+                self._log(pad_id, "bloc-modifie", block_id, users.get(sid) or args[10])
+                block = dict(block)
+            sio.emit("modifierbloc", block, to=f"pad-{pad_id}")
+
+        @command
+        def commenterbloc(sid, block_id, pad_id, title, text, color, username, name):
+            pad_id = int(pad_id)
+            with self.lock:
+                block = next(block for block in self.blocks[pad_id] if block["bloc"] == block_id)
+                block["commentaires"] += 1
+                self._log(pad_id, "bloc-commente", block_id, users.get(sid) or username)
+            comment = {"bloc": block_id, "titre": title, "texte": text, "couleur": color}
+            sio.emit("commenterbloc", {**comment, "identifiant": username, "nom": name}, to=f"pad-{pad_id}")
+
+        @command
+        def modifiertitrecolonne(sid, pad_id, title, column_n, username):
+            pad_id = int(pad_id)
+            with self.lock:
+                pad = self.pads[pad_id]
+                columns = json.loads(pad["colonnes"])
+                columns[int(column_n)] = title
+                pad["colonnes"] = json.dumps(columns)
+                self._log(pad_id, "colonne-modifiee", "", users.get(sid) or username)
+            sio.emit("modifiertitrecolonne", {"titre": title, "colonne": int(column_n)}, to=f"pad-{pad_id}")
+
+        @command
+        def modifiertitre(sid, pad_id, title, username):
+            pad_id = int(pad_id)
+            with self.lock:
+                self.pads[pad_id]["titre"] = title
+                self._log(pad_id, "titre-modifie", "", users.get(sid) or username)
+            sio.emit("modifiertitre", {"titre": title}, to=f"pad-{pad_id}")
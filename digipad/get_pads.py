@@ -1,9 +1,8 @@
 from dataclasses import dataclass, field
-from typing import TypeVar, overload
+from typing import ClassVar, TypeVar, overload
 
-import requests
-
-from .edit import Pad, PadList, format_pads
+from .edit import Pad, PadList, format_pads, parse_pad_url
+from .retry import is_not_handled
 from .session import Session
 
 NOT_PROVIDED = object()
@@ -24,20 +23,81 @@ class PadsOnAccount:
     folder_names: dict[str, str] = field(default_factory=dict)
     folders: dict[str, PadList] = field(default_factory=dict)
     pad_hashes: dict[int, str] = field(default_factory=dict)
+    _pads_by_id: "dict[int, Pad] | None" = field(default=None, init=False, repr=False, compare=False)
+    _pads_by_title: "dict[str, PadList] | None" = field(default=None, init=False, repr=False, compare=False)
+    _folder_ids: "dict[str, str] | None" = field(default=None, init=False, repr=False, compare=False)
+
+    pad_class: ClassVar[type] = Pad
+
+    @classmethod
+    def from_snapshot(cls, session, snapshot: dict):
+        """
+        Return the pads on an account from a snapshot of the account (see `cache.make_snapshot`).
+        """
+        pad_hashes = snapshot["pad_hashes"]
+
+        pads = cls(
+            session=session,
+            created=format_pads(snapshot["padsCrees"], pad_hashes, session, cls.pad_class),
+            visited=format_pads(snapshot["padsRejoints"], pad_hashes, session, cls.pad_class),
+            admin=format_pads(snapshot["padsAdmins"], pad_hashes, session, cls.pad_class),
+            favourite=format_pads(snapshot["padsFavoris"], pad_hashes, session, cls.pad_class),
+            pad_hashes=pad_hashes,
+        )
+
+        pads_by_id = pads.pads_by_id
+        for folder in snapshot["dossiers"]:
+            pads.folder_names[folder["id"]] = folder["nom"]
+            pads.folders[folder["id"]] = PadList(
+                [pads_by_id[pad_id] for pad_id in folder["pads"] if pad_id in pads_by_id],
+                session=session,
+            )
+
+        return pads
+
+    def clear_indexes(self):
+        """
+        Forget the indexes of the pads and folders, so they are rebuilt on the next lookup.
+        This must be called after changing the pad lists or the folders directly.
+        """
+        self._pads_by_id = None
+        self._pads_by_title = None
+        self._folder_ids = None
+
+    @property
+    def pads_by_id(self) -> "dict[int, Pad]":
+        """
+        A dict that maps the IDs of all the known pads to the pads.
+        """
+        pads_by_id = self._pads_by_id
+        if pads_by_id is None:
+            # the index is only set when it is complete, so it can be used by other threads
+            pads_by_id = {}
+            for pad_list in (self.created, self.visited, self.admin, self.favourite):
+                for pad in pad_list:
+                    pads_by_id.setdefault(pad.id, pad)
+            self._pads_by_id = pads_by_id
+        return pads_by_id
+
+    @property
+    def pads_by_title(self) -> "dict[str, PadList]":
+        """
+        A dict that maps the titles of all the known pads to the pads with this title.
+        """
+        pads_by_title = self._pads_by_title
+        if pads_by_title is None:
+            pads_by_title = {}
+            for pad in self.pads_by_id.values():
+                pads_by_title.setdefault(pad.title, PadList(session=self.session)).append(pad)
+            self._pads_by_title = pads_by_title
+        return pads_by_title
 
     @property
     def all(self):
         """
         All the known pads on the account.
         """
-        return PadList(
-            [
-                *self.created,
-                *self.visited,
-                *self.admin,
-                *self.favourite,
-            ]
-        )
+        return PadList(self.pads_by_id.values(), session=self.session)
 
     @overload
     def get(self, pad_id: "int | str", default=NOT_PROVIDED) -> Pad:
@@ -63,15 +123,28 @@ class PadsOnAccount:
             raise KeyError(f"Couldn't find pad {pad_id}")
         return ret[0]
 
-    def get_all(self, pad_ids: "list[int] | list[str] | list[int | str]"):
+    def get_all(self, pad_ids: "list[int] | list[str] | list[int | str]", jobs=None):
         """
         Return the pad IDs and hashes corresponding to the given IDs.
         You must give the URL (at least its end with the ID and the hash)
         if you haven't ever opened the pad on the account.
 
-        You can use the keywords `created`, `visited`, `admin`, `favourite`, `all` or a folder name.
+        You can use the keywords `created`, `visited`, `admin`, `favourite`, `all`, a folder name or a pad title.
+
+        The pads that are not on the account are fetched only once each,
+        with at most `jobs` of them at the same time (by default, the pool size of the session).
         """
-        ret = []
+        ret, unknown_pads = self._lookup_all(pad_ids)
+        fetched_pads = PadList(session=self.session).get_pads_info(unknown_pads, self.session, jobs)
+        return self._deduplicate(ret, fetched_pads)
+
+    def _lookup_all(self, pad_ids) -> "tuple[list[Pad | int], dict[int, str]]":
+        """
+        Return the known pads corresponding to the given IDs (see `get_all`), with the IDs
+        of the unknown pads in place of them, and a dict that maps these IDs to their hashes.
+        """
+        ret: "list[Pad | int]" = []
+        unknown_pads: dict[int, str] = {}
 
         for pad_id in pad_ids:
             if pad_id in ("created", "visited", "admin", "favourite", "all"):
@@ -79,17 +152,46 @@ class PadsOnAccount:
                 continue
 
             try:
-                ret.append(self.all.get(pad_id, self.session))
+                pad_id, pad_hash = parse_pad_url(pad_id)
             except ValueError:
-                ret.extend(self.get_pads_in_folder(pad_id))
+                ret.extend(self.get_pads_by_name(pad_id))
+                continue
+
+            pad = self.pads_by_id.get(pad_id)
+            if pad is None:
+                # the pad will be fetched later
+                if not unknown_pads.get(pad_id):
+                    unknown_pads[pad_id] = pad_hash
+                ret.append(pad_id)
+            else:
+                ret.append(pad)
 
-        # deduplicate the list
-        ret2 = []
-        for pad in ret:
-            if pad not in ret2:
-                ret2.append(pad)
+        return ret, unknown_pads
 
-        return PadList(ret2)
+    def _deduplicate(self, pads: "list[Pad | int]", fetched_pads: "dict[int, Pad]"):
+        """
+        Return a `PadList` of the given pads without duplicates, replacing the IDs by the fetched pads.
+        """
+        unique_pads: dict[int, Pad] = {}
+        for pad in pads:
+            if isinstance(pad, int):
+                pad = fetched_pads[pad]
+            unique_pads.setdefault(pad.id, pad)
+        return PadList(unique_pads.values(), session=self.session)
+
+    def get_pads_by_name(self, name):
+        """
+        Return the pads in a folder (with its ID or its name) or the pads with the given title.
+        """
+        try:
+            return self.get_pads_in_folder(name)
+        except ValueError:
+            pass
+
+        if name in self.pads_by_title:
+            return self.pads_by_title[name]
+
+        raise ValueError(f"Can't find folder or pad {name}")
 
     def get_pads_in_folder(self, folder_name):
         """
@@ -100,46 +202,72 @@ class PadsOnAccount:
             return self.folders[folder_name]
 
         # folder name
-        for folder_id, folder_name_to_try in self.folder_names.items():
-            if folder_name_to_try == folder_name:
-                return self.folders[folder_id]
+        folder_ids = self._folder_ids
+        if folder_ids is None:
+            folder_ids = {}
+            for folder_id, folder_name_to_index in self.folder_names.items():
+                folder_ids.setdefault(folder_name_to_index, folder_id)
+            self._folder_ids = folder_ids
+        if folder_name in folder_ids:
+            return self.folders[folder_ids[folder_name]]
 
         raise ValueError(f"Can't find folder {folder_name}")
 
-    def copy_pad(self, pad_id: "int | str"):
+    def copy_pad(self, pad_id: "int | str", title=None):
         """
-        Copy the pad with the specified ID.
+        Copy the pad with the specified ID. If a `title` is specified, the copy is renamed.
         """
         pad = self.get(pad_id)
-        req = requests.post(
+        req = self._post_creation(
             f"{self.session.domain}/api/dupliquer-pad",
-            json={"padId": pad.id, "identifiant": self.session.userinfo.username},
-            cookies={"digipad": self.session.userinfo.cookie},
+            {"padId": pad.id, "identifiant": self.session.userinfo.username},
         )
-        req.raise_for_status()
         try:
             data = req.json()
         except OSError:
             raise ValueError(f"Can't copy pad {pad.title} ({req.text})") from None
-        self.created.extend(format_pads([data], self.pad_hashes, self.session))
+        if title is not None:
+            copy = format_pads([data], None, self.session)[0]
+            copy.rename(title)
+            copy.connection.close()
+            data["titre"] = title
+        self._add_created_pad(data)
 
     def create_pad(self, title, template: "int | str | None" = None):
         """
         Create a pad with the specified title.
         """
         if template:
-            self.copy_pad(template)
-            self.created[-1].rename(title)
+            self.copy_pad(template, title)
             return
 
-        req = requests.post(
+        req = self._post_creation(
             f"{self.session.domain}/api/creer-pad",
-            json={"titre": title, "identifiant": self.session.userinfo.username},
-            cookies={"digipad": self.session.userinfo.cookie},
+            {"titre": title, "identifiant": self.session.userinfo.username},
         )
-        req.raise_for_status()
         try:
             data = req.json()
         except OSError:
             raise ValueError(f"Can't create pad {title} ({req.text})") from None
-        self.created.extend(format_pads([data], self.pad_hashes, self.session))
+        self._add_created_pad(data)
+
+    def _post_creation(self, url, data: dict):
+        """
+        Send a request that creates a pad, sending it again only if the server hasn't handled it.
+        """
+
+        def attempt(_number):
+            req = self.session.http.post(url, json=data, cookies={"digipad": self.session.userinfo.cookie})
+            req.raise_for_status()
+            return req
+
+        return self.session.retry("create", attempt, is_not_handled)
+
+    def _add_created_pad(self, data: dict):
+        """
+        Add a newly created pad to the created pads and to the account snapshot.
+        """
+        self.created.extend(format_pads([data], self.pad_hashes, self.session, self.pad_class))
+        self.clear_indexes()
+        if self.session.snapshot_cache:
+            self.session.snapshot_cache.add_pad(self.session.domain, self.session.userinfo.username, data)
@@ -0,0 +1,142 @@
+import threading
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    import requests
+
+# no limit by default (as the former `--delay 0`): the limiter only waits after the failures
+DEFAULT_RATE = 0.0
+DEFAULT_BURST = 10
+MIN_RATE = 0.2
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.1
+MAX_PAUSE = 30.0
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+class RateLimiter:
+    """
+    An adaptive token bucket that allows `rate` operations per second on average
+    and bursts of `burst` operations. It can be shared by several threads.
+
+    When an operation fails (error, timeout, throttling by the server), the rate is halved
+    (but not under `min_rate`) and it is increased by a tenth of `rate` after each operation that succeeds,
+    until it is back to `rate`.
+
+    If `rate` is 0, the operations are not limited but the limiter still waits after the failures
+    (0.5 s after the first one, then twice as long after each consecutive failure).
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=MIN_RATE):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.min_rate = min(min_rate, rate) if rate else min_rate
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Wait until an operation is allowed.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(self.paused_until - now, 0)
+            if self.rate:
+                # take the token now, so the concurrent operations wait for the next ones
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+        if wait:
+            time.sleep(wait)
+
+    def success(self):
+        """
+        Record that an operation succeeded.
+        """
+        with self.lock:
+            self.failures = 0
+            if self.rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+    def failure(self, retry_after=None):
+        """
+        Record that an operation failed, optionally with the number of seconds the server asked to wait.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.failures += 1
+            if self.rate:
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+                # no burst until the server is healthy again
+                self.tokens = min(self.tokens, 0)
+                pause = 0.0
+            else:
+                pause = min(0.5 * 2 ** (self.failures - 1), MAX_PAUSE)
+            if retry_after is not None:
+                pause = max(pause, min(retry_after, MAX_PAUSE))
+            self.paused_until = max(self.paused_until, now + pause)
+
+
+class RateLimitedHTTPClient:
+    """
+    A wrapper around a `requests.Session` that makes the requests go through a rate limiter
+    and tells it about the failures (connection errors, timeouts and HTTP 429 or 503 responses).
+    """
+
+    def __init__(self, http: "requests.Session", limiter: RateLimiter):
+        self.http = http
+        self.limiter = limiter
+
+    def request(self, method, url, **kwargs) -> "requests.Response":
+        """
+        Send a request once the rate limiter allows it.
+        """
+        import requests
+
+        self.limiter.acquire()
+        try:
+            response = self.http.request(method, url, **kwargs)
+        except (OSError, requests.RequestException):
+            self.limiter.failure()
+            raise
+
+        if response.status_code in THROTTLING_STATUS_CODES or response.status_code >= 500:
+            self.limiter.failure(get_retry_after(response))
+        else:
+            self.limiter.success()
+        return response
+
+    def get(self, url, **kwargs) -> "requests.Response":
+        """
+        Send a GET request.
+        """
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> "requests.Response":
+        """
+        Send a POST request.
+        """
+        return self.request("POST", url, **kwargs)
+
+
+def get_retry_after(response: "requests.Response"):
+    """
+    Return the number of seconds in the `Retry-After` header of a response, or `None`.
+    """
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
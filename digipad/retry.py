@@ -0,0 +1,119 @@
+import random
+import sys
+import time
+from dataclasses import dataclass, replace
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+# the server has refused the request without handling it
+NOT_HANDLED_STATUS_CODES = (429, 503)
+
+
+class CommandError(ValueError):
+    """
+    A socket command that has failed or hasn't been answered. It may have been run by the server.
+    """
+
+
+class CommandNotSentError(CommandError):
+    """
+    A socket command that couldn't be sent, so it is safe to send it again.
+    """
+
+
+def get_connection_errors() -> "tuple[type[BaseException], ...]":
+    """
+    Return the error classes of the HTTP requests and the sockets (of the libraries that have been imported:
+    the errors can't come from the other ones).
+    """
+    errors: "list[type[BaseException]]" = [OSError, CommandError]
+    if "requests" in sys.modules:
+        errors.append(sys.modules["requests"].RequestException)
+    if "socketio" in sys.modules:
+        errors.append(sys.modules["socketio"].exceptions.SocketIOError)
+    return tuple(errors)
+
+
+def is_transient(err: BaseException):
+    """
+    Return `True` if an error can disappear by running the operation again.
+    """
+    import requests
+
+    if isinstance(err, requests.HTTPError):
+        return err.response is not None and err.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(err, get_connection_errors())
+
+
+def is_not_handled(err: BaseException):
+    """
+    Return `True` if an error means that the server hasn't run the operation,
+    so an operation that can't be run twice can be sent again.
+    """
+    import requests
+
+    if isinstance(err, requests.HTTPError):
+        return err.response is not None and err.response.status_code in NOT_HANDLED_STATUS_CODES
+    return isinstance(err, (requests.ConnectTimeout, CommandNotSentError))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How many times an operation is run before giving up (`attempts`, including the first one)
+    and how long to wait between the attempts: `backoff` seconds after the first one, then twice as long
+    after each attempt (but not more than `max_backoff`), plus or minus a random `jitter` (as a fraction).
+    """
+
+    attempts: int = DEFAULT_ATTEMPTS
+    backoff: float = DEFAULT_BACKOFF
+    max_backoff: float = MAX_BACKOFF
+    jitter: float = 0.5
+
+    def get_delay(self, attempt):
+        """
+        Return the number of seconds to wait after the `attempt`-th attempt.
+        """
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run(self, func, should_retry=is_transient):
+        """
+        Call `func` with the number of the attempt (starting from 1) until it succeeds,
+        as long as `should_retry` returns `True` for the errors, and return its result.
+        """
+        attempt = 1
+        while True:
+            try:
+                return func(attempt)
+            except Exception as err:  # pylint: disable=W0718
+                if attempt >= self.attempts or not should_retry(err):
+                    raise
+            time.sleep(self.get_delay(attempt))
+            attempt += 1
+
+
+# the operation classes:
+# - read: requests that only read data (pages, user information)
+# - export: exporting a pad
+# - command: socket commands that can be run twice (join a pad, edit a block, rename a pad or a column)
+# - create: operations that can't be run twice (create a pad or a block, add a comment),
+#   that are only retried when the server hasn't run them or when it can be checked that they haven't been run
+DEFAULT_RETRY_POLICIES = {
+    "read": RetryPolicy(),
+    "export": RetryPolicy(),
+    "command": RetryPolicy(),
+    "create": RetryPolicy(),
+}
+
+
+def make_retry_policies(attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF, policies=None):
+    """
+    Return retry policies for all the operation classes, with the same number of attempts and backoff
+    (the `policies` given for some operation classes are kept).
+    """
+    ret = {name: replace(policy, attempts=attempts, backoff=backoff) for name, policy in DEFAULT_RETRY_POLICIES.items()}
+    ret.update(policies or {})
+    return ret
@@ -1,10 +1,15 @@
+import typing
+from collections.abc import Mapping
 from urllib.parse import unquote
 
-import requests
-from flask.sessions import SessionMixin
+from .cache import USERINFO_CACHE, USERINFO_CACHE_FILE, AccountSnapshotCache, UserInfoCache, make_snapshot
+from .ratelimit import DEFAULT_BURST, DEFAULT_RATE, RateLimitedHTTPClient, RateLimiter
+from .retry import DEFAULT_BACKOFF, DEFAULT_RETRY_POLICIES, is_transient, make_retry_policies
+from .sockets import DEFAULT_SOCKET_POOL_SIZE, SocketPool
+from .utils import DEFAULT_POOL_SIZE, UserInfo, extract_data, get_cookie_from_args, get_http_client
 
-from .edit import PadList, format_pads
-from .utils import UserInfo, extract_data, get_cookie_from_args
+if typing.TYPE_CHECKING:
+    from .retry import RetryPolicy
 
 DEFAULT_INSTANCE = "https://digipad.app"
 
@@ -12,27 +17,126 @@ DEFAULT_INSTANCE = "https://digipad.app"
 class Session:
     """
     A session (logged-in or anonymous account) on the Digipad website.
+
+    All the HTTP requests made by the session (and by the pads that use it) go through `http`,
+    a keep-alive connection pool of `pool_size` connections that is shared between the sessions
+    with the same pool size.
+
+    The user information is only fetched when it is first needed and is kept in `userinfo_cache`
+    (an in-memory cache by default, also stored on disk for the command line).
+
+    If a `snapshot_cache` is given, the pads on the account are read from a snapshot
+    instead of being downloaded every time.
+
+    The pads share the `socket_pool_size` socket connections of `sockets`, which are disconnected
+    when the session is closed (with `close` or at the end of a `with` block).
+
+    The HTTP requests and the socket commands go through the same `limiter`, that waits after the errors
+    of the instance. If a `rate` is given, they are also limited to `rate` operations per second
+    with bursts of `burst` operations, and this rate is reduced when the instance returns errors.
+
+    The operations that fail because of a transient error are run again according to the `retry_policies`
+    of their operation class (see `digipad.retry`).
     """
 
-    def __init__(self, cookie=None, domain=DEFAULT_INSTANCE):
+    def __init__(
+        self,
+        cookie=None,
+        domain=DEFAULT_INSTANCE,
+        pool_size=DEFAULT_POOL_SIZE,
+        http=None,
+        userinfo_cache: "UserInfoCache | None" = None,
+        snapshot_cache: "AccountSnapshotCache | None" = None,
+        socket_pool_size=DEFAULT_SOCKET_POOL_SIZE,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        limiter: "RateLimiter | None" = None,
+        retry_policies: "dict[str, RetryPolicy] | None" = None,
+    ):
         if type(cookie).__name__ == "Options":
             opts = cookie
             cookie = get_cookie_from_args(opts, False)
             domain = getattr(opts, "domain", domain)
-        elif isinstance(cookie, SessionMixin):
+            pool_size = getattr(opts, "pool_size", pool_size)
+            socket_pool_size = getattr(opts, "socket_pool_size", socket_pool_size)
+            rate = getattr(opts, "rate", rate)
+            burst = getattr(opts, "burst", burst)
+            if retry_policies is None and hasattr(opts, "retries"):
+                retry_policies = make_retry_policies(opts.retries, getattr(opts, "retry_backoff", DEFAULT_BACKOFF))
+            if userinfo_cache is None and hasattr(opts, "cache_ttl"):
+                userinfo_cache = UserInfoCache(opts.cache_ttl, USERINFO_CACHE_FILE)
+            if snapshot_cache is None and hasattr(opts, "cache_ttl"):
+                snapshot_cache = AccountSnapshotCache(0 if getattr(opts, "refresh", False) else opts.cache_ttl)
+        elif isinstance(cookie, Mapping):
+            # a session of the web app
             opts = cookie
             cookie = opts.get("digipad_cookie")
             domain = opts.get("digipad_instance") or domain
 
-        self.domain = domain
-        if cookie:
-            self.userinfo = self.get_userinfo(cookie)
-        else:
-            self.userinfo = UserInfo(logged_in=False)
+        self.domain = domain or DEFAULT_INSTANCE
+        self.pool_size = pool_size
+        self.limiter = limiter or RateLimiter(rate, burst)
+        self.http = RateLimitedHTTPClient(http or get_http_client(pool_size), self.limiter)
+        self.retry_policies = {**DEFAULT_RETRY_POLICIES, **(retry_policies or {})}
+        self.userinfo_cache = USERINFO_CACHE if userinfo_cache is None else userinfo_cache
+        self.snapshot_cache = snapshot_cache
+        self.sockets = SocketPool(self, socket_pool_size)
+        self._cookie = cookie
+        self._userinfo: "UserInfo | None" = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def close(self):
+        """
+        Disconnect the sockets of the session.
+        """
+        self.sockets.close()
+
+    def retry(self, operation_class, func, should_retry=is_transient):
+        """
+        Run `func` (that takes the number of the attempt) with the retry policy of an operation class.
+        """
+        return self.retry_policies[operation_class].run(func, should_retry)
+
+    @property
+    def userinfo(self) -> UserInfo:
+        """
+        The information about the user of the session, fetched on first access.
+        """
+        if self._userinfo is None:
+            if not self._cookie:
+                self._userinfo = UserInfo(logged_in=False)
+            else:
+                userinfo = self.userinfo_cache.get(self.domain, self._cookie)
+                if userinfo is None:
+                    userinfo = self.get_userinfo(self._cookie)
+                    self.userinfo_cache.set(self.domain, self._cookie, userinfo)
+                self._userinfo = userinfo
+        return self._userinfo
+
+    @userinfo.setter
+    def userinfo(self, userinfo: UserInfo):
+        self._userinfo = userinfo
+        self._cookie = userinfo.cookie
+        if userinfo.cookie:
+            self.userinfo_cache.set(self.domain, userinfo.cookie, userinfo)
+
+    def logout(self):
+        """
+        Forget the cookie of the session and its cached user information.
+        """
+        if self._cookie:
+            self.userinfo_cache.invalidate(self.domain, self._cookie)
+        self._cookie = None
+        self._userinfo = UserInfo(logged_in=False)
 
     def login(self, username, password):
         """Log into Digipad and return the corresponding userinfo."""
-        req = requests.post(
+        req = self.http.post(
             f"{self.domain}/api/connexion",
             json={
                 "identifiant": username,
@@ -62,14 +166,19 @@ class Session:
         Return user information from a Digipad cookie.
         """
         try:
-            req = requests.get(
-                self.domain,
-                cookies={"digipad": digipad_cookie},
+            req = self.retry(
+                "read",
+                lambda _attempt: self.http.get(
+                    self.domain,
+                    cookies={"digipad": digipad_cookie},
+                    stream=True,
+                ),
             )
         except OSError:
             return UserInfo(connection_error=True)
 
         if not req.history or not 300 <= req.history[0].status_code < 400:
+            req.close()
             return UserInfo(logged_in=False)
 
         username = req.url.rstrip("/").rsplit("/")[-1]
@@ -85,7 +194,9 @@ class Session:
         Return anonymous user information from a pad ID and a hash.
         """
         try:
-            req = requests.get(f"{self.domain}/p/{pad_id}/{pad_hash}")
+            req = self.retry(
+                "read", lambda _attempt: self.http.get(f"{self.domain}/p/{pad_id}/{pad_hash}", stream=True)
+            )
         except OSError:
             return UserInfo(connection_error=True)
 
@@ -103,43 +214,57 @@ class Session:
 
     @cookie.setter
     def cookie(self, cookie):
-        self.userinfo = self.get_userinfo(cookie)
+        if self._cookie:
+            self.userinfo_cache.invalidate(self.domain, self._cookie)
+        if cookie:
+            self.userinfo_cache.invalidate(self.domain, cookie)
+        self._cookie = cookie
+        self._userinfo = None
 
     @property
     def pads(self):
         """
         All the pads on the account. If the account is an anonymous account, there will be no pads.
         """
+        return self.get_pads()
+
+    def get_pads(self, refresh=False):
+        """
+        Return all the pads on the account, from the account snapshot if it is fresh enough
+        (unless `refresh` is true), otherwise from the account page.
+        """
         from .get_pads import PadsOnAccount
 
         if not self.cookie:
             return PadsOnAccount(session=self)
 
-        req = requests.get(
+        snapshot = None
+        if self.snapshot_cache and not refresh:
+            snapshot = self.snapshot_cache.get(self.domain, self.userinfo.username)
+
+        if snapshot is None:
+            page_props = self.retry("read", lambda _attempt: self._get_account_page())
+            if page_props is None:
+                return PadsOnAccount(session=self)
+            snapshot = make_snapshot(page_props)
+            if self.snapshot_cache:
+                self.snapshot_cache.set(self.domain, self.userinfo.username, snapshot)
+
+        return PadsOnAccount.from_snapshot(self, snapshot)
+
+    def _get_account_page(self):
+        """
+        Return the data of the account page, or `None` if the user is not logged in.
+        """
+        req = self.http.get(
             f"{self.domain}/u/" + self.userinfo.username,
             allow_redirects=False,
             cookies={"digipad": self.cookie},
+            stream=True,
         )
         if 300 <= req.status_code < 400:
             # redirected to home page = not logged in
-            return PadsOnAccount(session=self)
+            req.close()
+            return None
         req.raise_for_status()
-
-        data = extract_data(req)
-
-        pad_hashes = {}
-
-        pads = PadsOnAccount(
-            session=self,
-            created=format_pads(data["pageProps"]["padsCrees"], pad_hashes, self),
-            visited=format_pads(data["pageProps"]["padsRejoints"], pad_hashes, self),
-            admin=format_pads(data["pageProps"]["padsAdmins"], pad_hashes, self),
-            favourite=format_pads(data["pageProps"]["padsFavoris"], pad_hashes, self),
-            pad_hashes=pad_hashes,
-        )
-
-        for folder in data["pageProps"]["dossiers"]:
-            pads.folder_names[folder["id"]] = folder["nom"]
-            pads.folders[folder["id"]] = PadList([pad for pad in pads.all if pad.id in folder["pads"]])
-
-        return pads
+        return extract_data(req)["pageProps"]
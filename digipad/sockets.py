@@ -0,0 +1,329 @@
+import threading
+import typing
+from collections import Counter
+from concurrent.futures import Future, InvalidStateError
+from urllib.parse import quote
+
+from .retry import CommandError
+
+if typing.TYPE_CHECKING:
+    import socketio
+
+    from .session import Session
+
+DEFAULT_SOCKET_POOL_SIZE = 4
+ERROR_EVENTS = ("erreur", "deconnecte")
+
+
+class Waiter:
+    """
+    A command waiting for an event, with the future that will receive the data of the event.
+    """
+
+    def __init__(self, event, match=None):
+        self.event = event
+        self.match = match
+        self.future: Future = Future()
+
+    def accepts(self, event, data):
+        """
+        Return `True` if the event is the one the command is waiting for.
+        """
+        if self.future.done():
+            # the command has been cancelled
+            return False
+        return event == self.event and (self.match is None or self.match(data))
+
+
+class EventDispatcher:
+    """
+    Route the events received on a socket to the commands that are waiting for them,
+    so several commands can be in flight at the same time on the same socket.
+
+    The events that no command is waiting for (e.g. the changes made by other users of a pad) are ignored.
+    """
+
+    def __init__(self):
+        self.waiters: list[Waiter] = []
+        self.lock = threading.Lock()
+
+    def expect(self, event, match=None) -> Future:
+        """
+        Return a future that will receive the data of the next `event` accepted by `match`.
+        """
+        waiter = Waiter(event, match)
+        with self.lock:
+            self.waiters.append(waiter)
+        return waiter.future
+
+    def cancel(self, future: Future):
+        """
+        Stop waiting for the event of a future.
+        """
+        with self.lock:
+            self.waiters = [waiter for waiter in self.waiters if waiter.future is not future]
+        future.cancel()
+
+    def dispatch(self, event, *args):
+        """
+        Give an event to the oldest command that is waiting for it.
+        """
+        data = args[0] if args else None
+        with self.lock:
+            if event in ERROR_EVENTS:
+                # errors don't say which command failed, so they are given to the oldest one
+                # (the commands in flight on a socket are all on the same pad, see `PooledSocket.send`)
+                waiter = next((waiter for waiter in self.waiters if not waiter.future.done()), None)
+            else:
+                waiter = next((waiter for waiter in self.waiters if waiter.accepts(event, data)), None)
+            # forget the cancelled commands at the same time
+            self.waiters = [other for other in self.waiters if other is not waiter and not other.future.done()]
+        if waiter is None:
+            return
+        try:
+            if event in ERROR_EVENTS:
+                waiter.future.set_exception(CommandError(f"Can't run command {waiter.event} ({event}: {data})"))
+            else:
+                waiter.future.set_result(data)
+        except InvalidStateError:
+            # the command has been cancelled in the meantime
+            pass
+
+    def fail_all(self, exc: BaseException):
+        """
+        Give an exception to all the commands that are waiting.
+        """
+        with self.lock:
+            waiters = self.waiters
+            self.waiters = []
+        for waiter in waiters:
+            try:
+                waiter.future.set_exception(exc)
+            except InvalidStateError:
+                pass
+
+
+class PooledSocket:
+    """
+    A long-lived socket.io connection to a Digipad instance, that joins and leaves pad rooms
+    (with the `connexion` and `sortie` commands) instead of being closed after each pad.
+
+    A socket can be shared by several pad connections: the events it receives are routed by its `dispatcher`.
+    The errors and some replies don't say which pad they are about, so the commands in flight on a socket
+    are always on the same pad: the commands on another pad wait until they are done.
+    """
+
+    def __init__(self, pool: "SocketPool"):
+        self.pool = pool
+        self.client: "socketio.Client | None" = None
+        self.cookie = None
+        self.dispatcher = EventDispatcher()
+        # pads joined on the server, and number of pad connections using the socket for each pad
+        self.rooms: set[int] = set()
+        self.users: Counter = Counter()
+        self.lock = threading.RLock()
+        # the pad of the commands in flight, and their number
+        self.active_pad = None
+        self.in_flight = 0
+        self.idle = threading.Condition()
+
+    @property
+    def load(self):
+        """
+        The number of pad connections using the socket.
+        """
+        return sum(self.users.values())
+
+    @property
+    def connected(self):
+        """
+        `True` if the socket is connected with the current cookie of the session.
+        """
+        return self.client is not None and self.client.connected and self.cookie == self.pool.session.cookie
+
+    def connect(self):
+        """
+        Connect the socket if it is not connected (or reconnect it if the cookie of the session has changed).
+        """
+        with self.lock:
+            if self.connected:
+                return
+            self.disconnect()
+
+            import socketio
+
+            session = self.pool.session
+            client = socketio.Client(reconnection=False)
+            client.on("*", self.dispatcher.dispatch)
+            client.on("disconnect", self._on_disconnect)
+            client.connect(
+                session.domain,
+                headers={"Cookie": "digipad=" + quote(session.cookie)},
+            )
+            self.client = client
+            self.cookie = session.cookie
+
+    def _on_disconnect(self, *_args):
+        from socketio import exceptions
+
+        self.rooms.clear()
+        self.dispatcher.fail_all(exceptions.DisconnectedError())
+
+    def disconnect(self):
+        """
+        Disconnect the socket.
+        """
+        with self.lock:
+            self.rooms.clear()
+            if self.client is None:
+                # never connected (socket.io may not be imported) or already disconnected
+                return
+            from socketio import exceptions
+
+            try:
+                self.client.disconnect()
+            except (OSError, exceptions.SocketIOError):
+                pass
+            self.client = None
+        self.dispatcher.fail_all(exceptions.DisconnectedError())
+
+    def emit(self, event, data=None):
+        """
+        Send an event to the server.
+        """
+        from socketio import exceptions
+
+        if self.client is None:
+            raise exceptions.DisconnectedError()
+        self.client.emit(event, data)
+
+    def send(self, event, data=None, expected=None, match=None, pad_id=None, timeout=None) -> Future:
+        """
+        Send an event about a pad to the server and return a future that will receive the data of the reply
+        (the next `expected` event accepted by `match`, by default an event with the same name).
+
+        If commands on another pad are in flight, the event is sent when they are done:
+        a `CommandError` is raised if they are not done after `timeout` seconds.
+        """
+        self._activate(pad_id, timeout)
+        limiter = self.pool.session.limiter
+        try:
+            limiter.acquire()
+            future = self.dispatcher.expect(expected or event, match)
+        except BaseException:
+            self._deactivate()
+            raise
+
+        def done(future: Future):
+            # the commands that time out or can't be sent are cancelled
+            if future.cancelled() or future.exception():
+                limiter.failure()
+            else:
+                limiter.success()
+            self._deactivate()
+
+        future.add_done_callback(done)
+        try:
+            self.emit(event, data)
+        except BaseException:
+            self.dispatcher.cancel(future)
+            raise
+        return future
+
+    def _activate(self, pad_id, timeout=None):
+        """
+        Wait until the socket has no commands in flight on another pad, and count a new command on a pad.
+        """
+        with self.idle:
+            if not self.idle.wait_for(lambda: self.in_flight == 0 or self.active_pad == pad_id, timeout):
+                raise CommandError(f"The socket is busy with the commands of pad #{self.active_pad}")
+            self.active_pad = pad_id
+            self.in_flight += 1
+
+    def _deactivate(self):
+        """
+        Count a command that is done, and let the commands on other pads be sent if it was the last one.
+        """
+        with self.idle:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self.active_pad = None
+                self.idle.notify_all()
+
+
+class SocketPool:
+    """
+    A pool of at most `size` socket connections to the instance of a session, shared by its pads.
+
+    A pad connection acquires the least used socket when it connects to the pad and releases it when it is closed,
+    so the sockets are reused without a new handshake.
+    """
+
+    def __init__(self, session: "Session", size=DEFAULT_SOCKET_POOL_SIZE):
+        self.session = session
+        self.size = size
+        self.sockets: list[PooledSocket] = []
+        self.lock = threading.Lock()
+
+    def acquire(self, pad_id) -> PooledSocket:
+        """
+        Return a connected socket for a pad.
+        """
+        with self.lock:
+            socket = min(self.sockets, key=lambda socket: socket.load, default=None)
+            if socket is None or (socket.load and len(self.sockets) < self.size):
+                socket = PooledSocket(self)
+                self.sockets.append(socket)
+            socket.users[pad_id] += 1
+
+        try:
+            socket.connect()
+        except Exception:
+            self.release(socket, pad_id)
+            raise
+        return socket
+
+    def release(self, socket: PooledSocket, pad_id):
+        """
+        Stop using a socket for a pad, and leave the pad if no other pad connection uses it.
+        """
+        with socket.lock:
+            socket.users[pad_id] -= 1
+            if socket.users[pad_id] > 0:
+                return
+            del socket.users[pad_id]
+            if pad_id in socket.rooms:
+                socket.rooms.discard(pad_id)
+                if socket.connected:
+                    socket.emit("sortie", (pad_id, self.session.userinfo.username))
+
+    def close(self):
+        """
+        Disconnect all the sockets of the pool.
+        """
+        with self.lock:
+            for socket in self.sockets:
+                socket.disconnect()
+
+
+def chain_future(future: Future, func) -> Future:
+    """
+    Return a future that will receive the result of `func` called on the result of another future.
+    """
+    chained: Future = Future()
+    # cancelling the chained future also cancels the command
+    chained.add_done_callback(lambda chained: chained.cancelled() and future.cancel())
+
+    def callback(future: Future):
+        if future.cancelled():
+            chained.cancel()
+        elif future.exception() is not None:
+            chained.set_exception(future.exception())
+        else:
+            try:
+                chained.set_result(func(future.result()))
+            except Exception as err:  # pylint: disable=W0718
+                chained.set_exception(err)
+
+    future.add_done_callback(callback)
+    return chained
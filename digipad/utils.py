@@ -1,17 +1,17 @@
+import functools
 import json
 import os
 import random
-import re
 import typing
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Literal, overload
 from urllib.parse import unquote
 
-import requests
-
 if typing.TYPE_CHECKING:
-    from . import Options
+    import requests
+
+    from .commands import Options
     from .edit import PadList
 
 
@@ -66,6 +66,28 @@ class UserInfo:
 
 
 COOKIE_FILE = Path.home() / ".digipad_cookie"
+DEFAULT_POOL_SIZE = 10
+
+
+@functools.lru_cache
+def get_http_client(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Return a shared HTTP client that keeps up to `pool_size` connections alive per host.
+
+    The client never stores cookies: the Digipad cookie is passed explicitly on each request,
+    so the same client can be used by several sessions (e.g. in the web app).
+    """
+    from http.cookiejar import DefaultCookiePolicy
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    client = requests.Session()
+    client.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    client.mount("https://", adapter)
+    client.mount("http://", adapter)
+    return client
 
 
 if typing.TYPE_CHECKING:
@@ -83,9 +105,8 @@ def get_cookie_from_args(args, needed=True):
     """
     Returns a Digipad cookie, checking first in the arguments. If `needed`, raise an exception.
     """
-    from . import Options
-
-    if args and isinstance(args, Options) and args.cookie:
+    # the command line interface isn't imported to check the type
+    if args and type(args).__name__ == "Options" and args.cookie:
         return unquote(args.cookie)
 
     return get_cookie(needed)
@@ -104,15 +125,93 @@ def get_cookie(needed=True):
     return None
 
 
-def extract_data(response: requests.Response):
+PAGE_CONTEXT_START = b'<script id="vike_pageContext"'
+PAGE_CONTEXT_END = b"</script>"
+CHUNK_SIZE = 65536
+DRAIN_LIMIT = 65536
+
+
+class PageContextExtractor:
     """
-    Extract JSON data from a Digipad response.
+    Find the JSON data of a Digipad page (the `vike_pageContext` script) in the chunks of the page,
+    without decoding or keeping the rest of the page.
+
+    Feed the chunks with `feed` until it returns `True`, then get the data with `result`.
     """
-    match = re.search(r'<script id="vike_pageContext"[^>]*>(.*?)</script>', response.text)
-    if not match:
-        raise ValueError("Can't extract data from response")
 
-    return json.loads(match[1])
+    def __init__(self):
+        self.buffer = bytearray()
+        self.start = -1
+        self.end = -1
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Add a chunk of the page and return `True` if the data has been found.
+        """
+        if self.end >= 0:
+            return True
+
+        searched = len(self.buffer)
+        self.buffer += chunk
+
+        if self.start < 0:
+            tag = self.buffer.find(PAGE_CONTEXT_START)
+            tag_end = self.buffer.find(b">", tag + len(PAGE_CONTEXT_START)) if tag >= 0 else -1
+            if tag_end < 0:
+                # only keep what can be the beginning of the tag
+                del self.buffer[: tag if tag >= 0 else max(0, len(self.buffer) - len(PAGE_CONTEXT_START) + 1)]
+                return False
+            self.start = tag_end + 1
+            searched = self.start
+
+        self.end = self.buffer.find(PAGE_CONTEXT_END, max(self.start, searched - len(PAGE_CONTEXT_END) + 1))
+        return self.end >= 0
+
+    def result(self):
+        """
+        Return the JSON data of the page.
+        """
+        if self.end < 0:
+            raise ValueError("Can't extract data from response")
+        start, end = self.start, self.end
+        return json.loads(bytes(self.buffer[start:end]))
+
+
+def extract_data_from_chunks(chunks: "typing.Iterable[bytes]"):
+    """
+    Extract JSON data from the chunks of a Digipad page, stopping as soon as the data is found.
+    """
+    extractor = PageContextExtractor()
+    for chunk in chunks:
+        if extractor.feed(chunk):
+            break
+    return extractor.result()
+
+
+def extract_data(response: "requests.Response"):
+    """
+    Extract JSON data from a Digipad response (preferably requested with `stream=True`).
+
+    Only the page until the end of the data is read; the rest of the page is only downloaded
+    if it is small, so the connection can be reused.
+    """
+    chunks = response.iter_content(CHUNK_SIZE)
+    try:
+        return extract_data_from_chunks(chunks)
+    finally:
+        drained = 0
+        for chunk in chunks:
+            drained += len(chunk)
+            if drained > DRAIN_LIMIT:
+                break
+        response.close()
+
+
+def extract_data_from_text(text: str):
+    """
+    Extract JSON data from the HTML code of a Digipad page.
+    """
+    return extract_data_from_chunks([text.encode()])
 
 
 table_verbose_names = {